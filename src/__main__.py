@@ -0,0 +1,57 @@
+from typing import List, Optional
+import runpy
+import sys
+
+# Command names and the module run for each of them. Modules are only
+# imported once their command is selected, so every command only pays for
+# the imports it needs.
+commands = {
+    "encode": "src.encoder",
+    "decode": "src.decoder",
+    "bench": "src.benchmarks.runner",
+    "batch": "src.batch",
+    "shard": "src.sharding",
+    "daemon": "src.daemon",
+    "client": "src.client",
+}
+
+
+def print_help(exec_name: str) -> None:
+    """Display help in console."""
+    print(f"""
+    Text to image encryption algorithm
+
+         Usage: python3 {exec_name} <command> [arguments]
+
+    Commands:
+        encode   Encode a text file into an image, see src/encoder.py
+        decode   Decode an image into a text file, see src/decoder.py
+        bench    Run the benchmarks, see src/benchmarks/runner.py
+        batch    Encode or decode many files, see src/batch.py
+        shard    Encode or decode shard images, see src/sharding.py
+        daemon   Start the daemon, see src/daemon.py
+        client   Send requests to the daemon, see src/client.py
+
+    Run a command without arguments to display its own help.
+    """)
+
+
+def main(arguments: Optional[List[str]] = None) -> None:
+    """Run a command as if its module was executed as a script.
+
+    :param arguments: The command name followed by its arguments. Defaults
+    to the command line arguments.
+    """
+    arguments = sys.argv[1:] if arguments is None else arguments
+    if not arguments or arguments[0] not in commands:
+        print_help("-m src")
+        return
+
+    # The module sees its own path as the program name, as when run directly
+    sys.argv = [sys.argv[0], *arguments[1:]]
+    runpy.run_module(commands[arguments[0]], run_name="__main__",
+                     alter_sys=True)
+
+
+if __name__ == "__main__":
+    main()
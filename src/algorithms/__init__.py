@@ -1,15 +1,13 @@
-from src.algorithms import base
-from src.algorithms import bit_cycle, bit_not, bit_reverse
-from src.algorithms import char_reverse
-from src.algorithms.streams import stream_seed, stream_rc4, stream_key
+from src.algorithms.registry import AlgorithmRegistry
 
-algo_dict = {
-    'a': base.BaseAlgorithm(),
-    'b': bit_cycle.BitCycleAlgorithm(),
-    'c': bit_not.BitNotAlgorithm(),
-    'd': bit_reverse.BitReverseAlgorithm(),
-    'e': char_reverse.CharReverseAlgorithm(),
-    'f': stream_key.StreamKeyAlgorithm(),
-    'g': stream_seed.StreamSeedAlgorithm(),
-    'h': stream_rc4.StreamRC4Algorithm(),
-}
+# Modules are imported the first time their algorithm is used
+algo_dict = AlgorithmRegistry("t2i.algorithms", {
+    'a': "src.algorithms.base:BaseAlgorithm",
+    'b': "src.algorithms.bit_cycle:BitCycleAlgorithm",
+    'c': "src.algorithms.bit_not:BitNotAlgorithm",
+    'd': "src.algorithms.bit_reverse:BitReverseAlgorithm",
+    'e': "src.algorithms.char_reverse:CharReverseAlgorithm",
+    'f': "src.algorithms.streams.stream_key:StreamKeyAlgorithm",
+    'g': "src.algorithms.streams.stream_seed:StreamSeedAlgorithm",
+    'h': "src.algorithms.streams.stream_rc4:StreamRC4Algorithm",
+})
@@ -1,3 +1,9 @@
+from typing import Union
+
+# Writable buffers accepted by the in-place methods
+Buffer = Union[bytearray, memoryview]
+
+
 class BaseAlgorithm:
     """Basic interface for the encoding and decoding algorithms in the project.
 
@@ -7,6 +13,13 @@ class BaseAlgorithm:
     This class requires no parameters.
     """
 
+    # How plan.compile_plan combines the algorithm with its neighbours:
+    # XOR-based algorithms are merged into a single pass over the text, and
+    # algorithms reversing the text cancel when repeated and mirror the
+    # position of every byte
+    xor_based = False
+    reverses_text = False
+
     def encode(self, text: bytes, **kwargs) -> bytes:
         """Encode the text using an arbitrary implementation."""
         return text
@@ -14,3 +27,26 @@ class BaseAlgorithm:
     def decode(self, text: bytes, **kwargs) -> bytes:
         """Decode the text using an arbitrary implementation."""
         return text
+
+    def encode_into(self, buffer: Buffer, **kwargs) -> None:
+        """Encode the text stored in a buffer, replacing its contents.
+
+        Algorithms that can transform the buffer in place override this
+        method. Otherwise, the buffer receives the output of encode().
+
+        :param buffer: The text to encode, as a bytearray or a writable
+        memoryview. Its length does not change.
+        :param kwargs: The same parameters accepted by encode().
+        """
+        buffer[:] = self.encode(bytes(buffer), **kwargs)
+
+    def decode_into(self, buffer: Buffer, **kwargs) -> None:
+        """Decode the text stored in a buffer, replacing its contents.
+
+        See encode_into().
+
+        :param buffer: The text to decode, as a bytearray or a writable
+        memoryview. Its length does not change.
+        :param kwargs: The same parameters accepted by decode().
+        """
+        buffer[:] = self.decode(bytes(buffer), **kwargs)
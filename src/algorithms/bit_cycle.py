@@ -12,6 +12,11 @@ class BitCycleAlgorithm(BaseAlgorithm):
     This class requires the following parameters:
         Algorithm list, provided by the user
         Algorithm index, calculated automatically
+    Or, instead:
+        Positions, the amount of bits to cycle
+    And optionally:
+        Bits, the amount of bits of each byte, 7 by default or 8 to cycle
+        every bit of the text
     """
 
     def __get_cycle_positions(self, **kwargs) -> int:
@@ -61,6 +66,22 @@ class BitCycleAlgorithm(BaseAlgorithm):
             positions = 4
         return max(positions, 1)
 
+    def get_cycle_positions(self, **kwargs) -> int:
+        """Determine the positions to shift based on the parameters.
+
+        :param kwargs: See BitCycleAlgorithm.
+        :return: The amount of positions to cycle.
+
+        >>> bca = BitCycleAlgorithm()
+        >>> bca.get_cycle_positions(positions=9)
+        9
+        >>> bca.get_cycle_positions(algorithms=bytes("b", "ascii"), index=0)
+        4
+        """
+        if "positions" in kwargs:
+            return kwargs["positions"]
+        return self.__get_cycle_positions(**kwargs)
+
     def encode(self, text: bytes, **kwargs) -> bytes:
         """Encode the text using the bit-wise left-cycle algorithm.
 
@@ -85,15 +106,13 @@ class BitCycleAlgorithm(BaseAlgorithm):
         ...     index=0)
         b'\\x1c'
         """
-        # Format each byte as a concatenation of 7-bit padded values
-        bit_list = bytes_conversions.bytes_to_bit_rep(text)
-
-        positions = self.__get_cycle_positions(**kwargs)
-        # Cycle first N bits
-        bit_list = bit_list[positions:] + bit_list[:positions]
-
-        # Reconstruct string and return
-        return bytes_conversions.bit_rep_to_bytes(bit_list)
+        positions = self.get_cycle_positions(**kwargs)
+        bits = kwargs.get("bits", 7)
+        # Cycle first N bits of the 7-bit representation
+        if positions > len(text) * bits:
+            # Cycling more bits than available leaves the text untouched
+            return text
+        return bytes_conversions.cycle_bits(text, positions, bits)
 
     def decode(self, text: bytes, **kwargs) -> bytes:
         """Decode the text using the bit-wise right-cycle algorithm.
@@ -119,13 +138,14 @@ class BitCycleAlgorithm(BaseAlgorithm):
         ...     index=0)
         b'\\x0e'
         """
-        bit_list = bytes_conversions.bytes_to_bit_rep(text)
-
-        positions = self.__get_cycle_positions(**kwargs)
-
-        bit_list = bit_list[-positions:] + bit_list[:-positions]
-        # Reconstruct string and return
-        return bytes_conversions.bit_rep_to_bytes(bit_list)
+        positions = self.get_cycle_positions(**kwargs)
+        bits = kwargs.get("bits", 7)
+        bit_count = len(text) * bits
+        if positions > bit_count:
+            return text
+        # Cycling right is cycling left the remaining bits
+        return bytes_conversions.cycle_bits(
+            text, bit_count - positions, bits)
 
 
 if __name__ == "__main__":
@@ -1,4 +1,8 @@
-from src.algorithms.base import BaseAlgorithm
+from src.algorithms.base import BaseAlgorithm, Buffer
+
+# NOT of the 7 lower bits of every byte value, or of all of them
+_NOT_BITS = {bits: bytes([byte ^ (2 ** bits - 1) for byte in range(256)])
+             for bits in (7, 8)}
 
 
 class BitNotAlgorithm(BaseAlgorithm):
@@ -8,9 +12,13 @@ class BitNotAlgorithm(BaseAlgorithm):
 
     The decoding process uses the same NOT operation as it is symmetric.
 
-    This class requires no parameters.
+    This class optionally requires the following parameters:
+        Bits, the amount of bits of each byte, 7 by default or 8 to negate
+        every bit of the text
     """
 
+    xor_based = True
+
     def encode(self, text: bytes, **kwargs) -> bytes:
         """Encode the text using a bit-wise NOT operation.
 
@@ -24,11 +32,20 @@ class BitNotAlgorithm(BaseAlgorithm):
         Instead, working with numbers in the range of 0..127 as an unsigned byte
         might prove to be easier to understand.
 
+        Every byte is replaced through a translation table holding the
+        subtraction for each byte value, so the text is processed in a single
+        pass instead of one byte at a time.
+
         :param text: The bytes object to encode.
         :param kwargs: See BitNotAlgorithm.
         :return: The encoded text, as a bytes object.
+
+        >>> BitNotAlgorithm().encode(bytes([0, 200]), bits=8)
+        b'\\xff7'
+        >>> BitNotAlgorithm().encode(bytes("abc", "ascii"))
+        b'\\x1e\\x1d\\x1c'
         """
-        return bytes([127 - t for t in text])
+        return bytes(text).translate(_NOT_BITS[kwargs.get("bits", 7)])
 
     def decode(self, text: bytes, **kwargs) -> bytes:
         """Decode the text using a bit-wise NOT operation.
@@ -40,3 +57,28 @@ class BitNotAlgorithm(BaseAlgorithm):
         :return: The decoded text, as a bytes object.
         """
         return self.encode(text, **kwargs)
+
+    def encode_into(self, buffer: Buffer, **kwargs) -> None:
+        """Encode the text stored in a buffer using a bit-wise NOT operation.
+
+        Every byte is replaced through the translation table of encode().
+
+        :param buffer: The bytearray or writable memoryview to encode.
+        :param kwargs: See BitNotAlgorithm.
+
+        >>> buffer = bytearray("abc", "ascii")
+        >>> BitNotAlgorithm().encode_into(buffer)
+        >>> bytes(buffer) == BitNotAlgorithm().encode(bytes("abc", "ascii"))
+        True
+        """
+        buffer[:] = bytes(buffer).translate(_NOT_BITS[kwargs.get("bits", 7)])
+
+    def decode_into(self, buffer: Buffer, **kwargs) -> None:
+        """Decode the text stored in a buffer using a bit-wise NOT operation.
+
+        Symmetric operation, see encode_into() for more information.
+
+        :param buffer: The bytearray or writable memoryview to decode.
+        :param kwargs: See BitNotAlgorithm.
+        """
+        self.encode_into(buffer, **kwargs)
@@ -10,24 +10,25 @@ class BitReverseAlgorithm(BaseAlgorithm):
 
     The decoding process uses the same operation as it is symmetric.
 
-    This class requires no parameters.
+    This class optionally requires the following parameters:
+        Bits, the amount of bits of each byte, 7 by default or 8 to reverse
+        every bit of the text
     """
 
+    reverses_text = True
+
     def encode(self, text: bytes, **kwargs) -> bytes:
         """Encode the text using bit-wise reversal.
 
-        After converting the bytes object to its binary representation in a
-        string, reverse the characters of the string and rebuild the bytes
-        object.
+        Reverses the 7-bit binary representation of the bytes object, which
+        is equivalent to reversing the order of the bytes and the order of the
+        bits inside each byte.
 
         :param text: The bytes object to encode.
         :param kwargs: See BitReverseAlgorithm.
         :return: The encoded text, as a bytes object.
         """
-        # Format each byte as a concatenation of 8-bit padded values
-        bit_list = bytes_conversions.bytes_to_bit_rep(text)
-        # Reconstruct reversed string and return
-        return bytes_conversions.bit_rep_to_bytes(bit_list[::-1])
+        return bytes_conversions.reverse_bits(text, kwargs.get("bits", 7))
 
     def decode(self, text: bytes, **kwargs) -> bytes:
         """Decode the text using a bit-wise NOT operation.
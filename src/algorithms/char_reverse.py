@@ -1,4 +1,4 @@
-from src.algorithms.base import BaseAlgorithm
+from src.algorithms.base import BaseAlgorithm, Buffer
 
 
 class CharReverseAlgorithm(BaseAlgorithm):
@@ -9,17 +9,26 @@ class CharReverseAlgorithm(BaseAlgorithm):
 
     The decoding process uses the same operation as it is symmetric.
 
+    Reversing a memoryview returns a reversed view of the same memory, so the
+    text is not copied until a later layer reads it.
+
     This class requires no parameters.
     """
 
+    reverses_text = True
+
     def encode(self, text: bytes, **kwargs) -> bytes:
         """Encode the text using byte-wise reversal.
 
         Reverse the characters of the string.
 
-        :param text: The bytes object to encode.
+        :param text: The bytes object to encode, or a memoryview of it.
         :param kwargs: See CharReverseAlgorithm.
-        :return: The encoded text, as a bytes object.
+        :return: The encoded text, as a bytes object, or as a memoryview if
+        the text was given as one.
+
+        >>> bytes(CharReverseAlgorithm().encode(memoryview(b"abc")))
+        b'cba'
         """
         return text[::-1]
 
@@ -33,3 +42,35 @@ class CharReverseAlgorithm(BaseAlgorithm):
         :return: The decoded text, as a bytes object.
         """
         return self.encode(text, **kwargs)
+
+    def encode_into(self, buffer: Buffer, **kwargs) -> None:
+        """Encode the text stored in a buffer, reversing it in place.
+
+        :param buffer: The bytearray or writable memoryview to encode.
+        :param kwargs: See CharReverseAlgorithm.
+
+        >>> buffer = bytearray(b"abc")
+        >>> CharReverseAlgorithm().encode_into(memoryview(buffer)[1:])
+        >>> buffer
+        bytearray(b'acb')
+        """
+        if isinstance(buffer, bytearray):
+            buffer.reverse()
+        else:
+            buffer[:] = buffer[::-1]
+
+    def decode_into(self, buffer: Buffer, **kwargs) -> None:
+        """Decode the text stored in a buffer, reversing it in place.
+
+        Symmetric operation, see encode_into() for more information.
+
+        :param buffer: The bytearray or writable memoryview to decode.
+        :param kwargs: See CharReverseAlgorithm.
+        """
+        self.encode_into(buffer, **kwargs)
+
+
+if __name__ == "__main__":
+    import doctest
+
+    doctest.testmod()
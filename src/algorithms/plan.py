@@ -0,0 +1,438 @@
+from typing import List, NamedTuple, Optional, Tuple
+from src import algorithms as algo
+from src.algorithms.base import BaseAlgorithm, Buffer
+from src.utilities import bytes_conversions, metrics
+
+XOR = "xor"
+CYCLE = "cycle"
+LAYER = "layer"
+
+
+class PlanStep(NamedTuple):
+    """Single operation of a compiled plan.
+
+    The operation determines how the rest of the fields are interpreted:
+        xor: XOR with the keystreams of every algorithm in algorithm_ids.
+        cycle: Bit cycle of the sum of the positions stored in arguments.
+        layer: Single algorithm, applied at the index stored in arguments.
+    """
+    operation: str
+    algorithm_ids: Tuple[str, ...]
+    arguments: Tuple[int, ...]
+
+
+class Plan:
+    """Minimal sequence of operations equivalent to an algorithm list.
+
+    Running the plan produces the same output as running every algorithm of
+    the list through encoder.encode_text or decoder.decode_text, but layers
+    that cancel each other are removed and consecutive layers that can be
+    combined are executed as a single pass over the text.
+
+    This class requires the following parameters:
+        Algorithm list, provided by the user
+        Steps, as generated by compile_plan
+    And optionally:
+        Bits, the amount of bits of each byte the layers work on, 7 by
+        default or 8 for dense images
+    """
+
+    def __init__(self, algorithm_list: bytes, steps: List[PlanStep],
+                 bits: int = 7):
+        self.algorithm_list = algorithm_list
+        self.steps = steps
+        self.bits = bits
+
+    def __len__(self) -> int:
+        return len(self.steps)
+
+    def __repr__(self) -> str:
+        return f"Plan({self.algorithm_list!r}, {self.steps!r})"
+
+    def encode(self, text: bytes) -> bytes:
+        """Encode the text running every step of the plan in order.
+
+        :param text: The text to encode.
+        :return: The encoded text.
+        """
+        buffer = bytearray(text)
+        self.encode_into(buffer)
+        return bytes(buffer)
+
+    def decode(self, text: bytes) -> bytes:
+        """Decode the text running every step of the plan in reverse order.
+
+        :param text: The text to decode.
+        :return: The decoded text.
+        """
+        buffer = bytearray(text)
+        self.decode_into(buffer)
+        return bytes(buffer)
+
+    def encode_into(self, buffer: Buffer) -> None:
+        """Encode the text stored in a buffer, replacing its contents.
+
+        Every step transforms the same buffer, in place whenever the
+        algorithm supports it, instead of creating a copy of the text for
+        each layer.
+
+        :param buffer: The text to encode, as a bytearray or a writable
+        memoryview.
+        """
+        for step in self.steps:
+            metrics.timed("layer", self._run_step, buffer, step, False,
+                          algorithm_id="".join(step.algorithm_ids))
+
+    def decode_into(self, buffer: Buffer) -> None:
+        """Decode the text stored in a buffer, replacing its contents.
+
+        See encode_into.
+
+        :param buffer: The text to decode, as a bytearray or a writable
+        memoryview.
+        """
+        for step in reversed(self.steps):
+            metrics.timed("layer", self._run_step, buffer, step, True,
+                          algorithm_id="".join(step.algorithm_ids))
+
+    def keystream(self, algorithm_id: str, length: int) -> bytes:
+        """Obtain the values XOR'd with the text by a single algorithm.
+
+        :param algorithm_id: The algorithm identifier.
+        :param length: The amount of values to obtain.
+        :return: The keystream, as a bytes object.
+        """
+        algorithm_object = algo.algo_dict[algorithm_id]
+        if hasattr(algorithm_object, "keystream_at"):
+            return algorithm_object.keystream(
+                length, algorithms=self.algorithm_list, bits=self.bits)
+        # Other XOR-based algorithms reveal their keystream when encoding zeros
+        return algorithm_object.encode(bytes(length), bits=self.bits)
+
+    def keystream_range(self, algorithm_id: str, start: int,
+                        length: int) -> bytes:
+        """Obtain the values XOR'd with a span of the text by an algorithm.
+
+        :param algorithm_id: The algorithm identifier.
+        :param start: The position of the first value.
+        :param length: The amount of values to obtain.
+        :return: The keystream of the span, as a bytes object.
+        """
+        algorithm_object = algo.algo_dict[algorithm_id]
+        if hasattr(algorithm_object, "keystream_at"):
+            return algorithm_object.keystream_at(
+                start, length, algorithms=self.algorithm_list, bits=self.bits)
+        # Other XOR-based algorithms work on each byte on its own
+        return algorithm_object.encode(bytes(length), bits=self.bits)
+
+    def decode_range(self, text: bytes, start: int, length: int) -> bytes:
+        """Decode a span of the text, without decoding the rest of it.
+
+        The span is followed through every step to find the bytes of the
+        encoded text that hold it: XOR steps keep every byte in place, bit
+        cycles move it by their amount of positions, and reversals mirror it.
+        Only those bytes are decoded, which for stream ciphers only requires
+        the keystream of the span. Plans with other layers decode the whole
+        text instead.
+
+        Like slicing, spans past the end of the text are shortened.
+
+        :param text: The encoded text.
+        :param start: The position of the first decoded byte.
+        :param length: The amount of bytes to decode.
+        :return: The decoded span of the text.
+
+        >>> p = compile_plan(bytes("b3fhegd", "ascii"))
+        >>> p.decode_range(p.encode(bytes("Hello world", "ascii")), 3, 5)
+        b'lo wo'
+        """
+        if start < 0 or length < 0:
+            raise ValueError("Ranges cannot be negative")
+        size = len(text)
+        length = max(min(length, size - start), 0)
+        if not length:
+            return bytes()
+
+        # Span of the text before each step is encoded
+        spans = []
+        span = (start, length)
+        for step in self.steps:
+            spans.append(span)
+            span = self._encoded_span(step, *span, size)
+            if span is None:
+                return self.decode(text)[start:start + length]
+
+        window = _cyclic_slice(text, *span)
+        for step, span in zip(reversed(self.steps), reversed(spans)):
+            window = self._decode_span(window, step, *span, size)
+        return bytes(window)
+
+    def _encoded_span(self, step: PlanStep, start: int, length: int,
+                      size: int) -> Optional[Tuple[int, int]]:
+        """Find the bytes holding a span of the text once a step encodes it.
+
+        Spans are cyclic: they continue from the start of the text when they
+        go past its end.
+
+        :param step: The step encoding the text.
+        :param start: The position of the span before the step.
+        :param length: The length of the span before the step.
+        :param size: The length of the whole text.
+        :return: The position and length of the encoded span, or None if the
+        step does not allow decoding a span on its own.
+        """
+        if step.operation == XOR:
+            return start, length
+
+        if step.operation == CYCLE:
+            bits = self.bits
+            bit_count = size * bits
+            first_bit = (start * bits - _cycle_positions(step, bit_count)
+                         ) % bit_count
+            # The span may start and end in the middle of a byte
+            encoded_length = -(-(first_bit % bits + length * bits) // bits)
+            if encoded_length > size:
+                return None
+            return first_bit // bits, encoded_length
+
+        if algo.algo_dict[step.algorithm_ids[0]].reverses_text:
+            # Reversals mirror every position
+            return (size - start - length) % size, length
+        return None
+
+    def _decode_span(self, window: bytes, step: PlanStep, start: int,
+                     length: int, size: int) -> bytes:
+        """Decode the bytes holding a span of the text through a step.
+
+        :param window: The encoded span, as found by _encoded_span.
+        :param step: The step encoding the text.
+        :param start: The position of the span before the step.
+        :param length: The length of the span before the step.
+        :param size: The length of the whole text.
+        :return: The span of the text before the step.
+        """
+        if step.operation == XOR:
+            mask = 0
+            for algorithm_id in step.algorithm_ids:
+                keystream = b"".join(
+                    self.keystream_range(algorithm_id, piece_start,
+                                         piece_length)
+                    for piece_start, piece_length in _cyclic_pieces(
+                        start, length, size))
+                mask ^= int.from_bytes(keystream, "big")
+            return (int.from_bytes(window, "big") ^ mask).to_bytes(
+                length, "big")
+
+        if step.operation == CYCLE:
+            bits = self.bits
+            bit_count = size * bits
+            first_bit = (start * bits - _cycle_positions(step, bit_count)
+                         ) % bit_count
+            return bytes_conversions.cycle_bits(
+                window, first_bit % bits, bits)[:length]
+
+        algorithm_object = algo.algo_dict[step.algorithm_ids[0]]
+        return algorithm_object.decode(
+            window, algorithms=self.algorithm_list, index=step.arguments[0],
+            bits=self.bits)
+
+    def _run_step(self, buffer: Buffer, step: PlanStep,
+                  decode: bool) -> Buffer:
+        """Run a single step of the plan over the text stored in a buffer.
+
+        :param buffer: The text, replaced by the result.
+        :param step: The step to run.
+        :param decode: Whether to decode instead of encoding.
+        :return: The buffer, so metrics can measure the output.
+        """
+        length = len(buffer)
+        if step.operation == XOR:
+            # Combine the keystreams first, so the text is XOR'd only once
+            mask = 0
+            for algorithm_id in step.algorithm_ids:
+                mask ^= int.from_bytes(
+                    self.keystream(algorithm_id, length), "big")
+            value = int.from_bytes(buffer, "big") ^ mask
+            buffer[:] = value.to_bytes(length, "big")
+            return buffer
+
+        if step.operation == CYCLE:
+            bit_count = length * self.bits
+            positions = _cycle_positions(step, bit_count)
+            if decode and bit_count:
+                positions = (bit_count - positions) % bit_count
+            buffer[:] = bytes_conversions.cycle_bits(
+                buffer, positions, self.bits)
+            return buffer
+
+        algorithm_object = algo.algo_dict[step.algorithm_ids[0]]
+        kwargs = {"algorithms": self.algorithm_list,
+                  "index": step.arguments[0], "bits": self.bits}
+        if decode:
+            algorithm_object.decode_into(buffer, **kwargs)
+        else:
+            algorithm_object.encode_into(buffer, **kwargs)
+        # Returned so metrics can measure the output
+        return buffer
+
+
+def _cycle_positions(step: PlanStep, bit_count: int) -> int:
+    """Calculate the amount of positions a cycle step moves the bits to the
+    left when encoding.
+
+    :param step: The cycle step.
+    :param bit_count: The amount of bits of the text.
+    :return: The amount of positions, lower than the amount of bits.
+
+    >>> _cycle_positions(PlanStep(CYCLE, ("b",), (49, 50)), 70)
+    29
+    """
+    # Cycles longer than the text leave it untouched
+    positions = sum(p for p in step.arguments if p <= bit_count)
+    return positions % bit_count if bit_count else positions
+
+
+def _cyclic_pieces(start: int, length: int,
+                   size: int) -> List[Tuple[int, int]]:
+    """Split a cyclic span into the spans before and after the end of the
+    text.
+
+    :param start: The position of the span.
+    :param length: The length of the span, no longer than the text.
+    :param size: The length of the text.
+    :return: The position and length of each piece, in order.
+
+    >>> _cyclic_pieces(8, 4, 10)
+    [(8, 2), (0, 2)]
+    """
+    if start + length <= size:
+        return [(start, length)]
+    return [(start, size - start), (0, start + length - size)]
+
+
+def _cyclic_slice(text: bytes, start: int, length: int) -> bytes:
+    """Obtain a cyclic span of the text, see _cyclic_pieces.
+
+    :param text: The text.
+    :param start: The position of the span.
+    :param length: The length of the span, no longer than the text.
+    :return: The bytes of the span.
+
+    >>> _cyclic_slice(bytes("abcde", "ascii"), 3, 4)
+    b'deab'
+    """
+    return b"".join(bytes(text[piece_start:piece_start + piece_length])
+                    for piece_start, piece_length in _cyclic_pieces(
+                        start, length, len(text)))
+
+
+def _build_step(algorithm_list: bytes, index: int) -> Optional[PlanStep]:
+    """Create the plan step for a single position of the algorithm list.
+
+    :param algorithm_list: The list of algorithm identifiers.
+    :param index: The algorithm list index.
+    :return: The step, or None if the algorithm does not modify the text.
+    """
+    algorithm_id = chr(algorithm_list[index])
+    algorithm_object = algo.algo_dict.get(algorithm_id)
+    if algorithm_object is None or type(algorithm_object) is BaseAlgorithm:
+        return None
+    if algorithm_object.xor_based:
+        return PlanStep(XOR, (algorithm_id,), ())
+    if hasattr(algorithm_object, "get_cycle_positions"):
+        positions = algorithm_object.get_cycle_positions(
+            algorithms=algorithm_list, index=index)
+        return PlanStep(CYCLE, (algorithm_id,), (positions,))
+    return PlanStep(LAYER, (algorithm_id,), (index,))
+
+
+def _merge_steps(first: PlanStep,
+                 second: PlanStep) -> Optional[List[PlanStep]]:
+    """Combine two consecutive steps into an equivalent list of steps.
+
+    :param first: The step executed first.
+    :param second: The step executed right after the first one.
+    :return: The steps replacing both of them, or None if they cannot be
+    combined.
+
+    >>> _merge_steps(
+    ...     PlanStep(XOR, ("c", "f"), ()), PlanStep(XOR, ("f",), ()))
+    [PlanStep(operation='xor', algorithm_ids=('c',), arguments=())]
+    >>> _merge_steps(
+    ...     PlanStep(LAYER, ("e",), (0,)), PlanStep(LAYER, ("e",), (1,)))
+    []
+    >>> _merge_steps(
+    ...     PlanStep(CYCLE, ("b",), (4,)), PlanStep(LAYER, ("d",), (1,)))
+    """
+    if first.operation != second.operation:
+        return None
+
+    if first.operation == XOR:
+        # Applying the same keystream twice cancels it
+        algorithm_ids = set(first.algorithm_ids) ^ set(second.algorithm_ids)
+        if not algorithm_ids:
+            return []
+        return [PlanStep(XOR, tuple(sorted(algorithm_ids)), ())]
+
+    if first.operation == CYCLE and first.algorithm_ids == second.algorithm_ids:
+        return [PlanStep(CYCLE, first.algorithm_ids,
+                         first.arguments + second.arguments)]
+
+    if first.algorithm_ids == second.algorithm_ids and \
+            algo.algo_dict[first.algorithm_ids[0]].reverses_text:
+        # Reversals are their own inverse
+        return []
+
+    return None
+
+
+def _push_step(steps: List[PlanStep], step: PlanStep) -> None:
+    """Append a step to a plan, combining it with the last step if possible.
+
+    :param steps: The steps compiled so far.
+    :param step: The step to append.
+    """
+    if steps:
+        merged = _merge_steps(steps[-1], step)
+        if merged is not None:
+            # The result may in turn combine with the steps before it
+            steps.pop()
+            for merged_step in merged:
+                _push_step(steps, merged_step)
+            return
+    steps.append(step)
+
+
+def compile_plan(algorithm_list: bytes, bits: int = 7) -> Plan:
+    """Compile an algorithm list into its minimal equivalent plan.
+
+    Algorithms that do not modify the text are dropped. XOR-based algorithms
+    (NOT operations and stream ciphers) next to each other are combined into a
+    single XOR, where repeated keystreams cancel out. Consecutive bit cycles
+    are added together, and consecutive reversals cancel each other.
+
+    :param algorithm_list: The list of algorithm identifiers.
+    :param bits: The amount of bits of each byte, see Plan.
+    :return: The compiled plan.
+
+    >>> compile_plan(bytes("acca", "ascii")).steps
+    []
+    >>> len(compile_plan(bytes("cfgfhgcd", "ascii")))
+    2
+    >>> compile_plan(bytes("b1b2", "ascii")).steps
+    [PlanStep(operation='cycle', algorithm_ids=('b',), arguments=(49, 50))]
+    >>> compile_plan(bytes("deed", "ascii")).steps
+    []
+    """
+    steps = []
+    for index in range(len(algorithm_list)):
+        step = _build_step(algorithm_list, index)
+        if step is not None:
+            _push_step(steps, step)
+    return Plan(algorithm_list, steps, bits)
+
+
+if __name__ == "__main__":
+    import doctest
+
+    doctest.testmod()
@@ -0,0 +1,122 @@
+from collections.abc import Mapping
+from importlib import import_module
+from threading import Lock
+from typing import Dict, Iterator, Optional, Union
+from src.algorithms.base import BaseAlgorithm
+
+# Either an algorithm instance, an algorithm class, or the location of one
+# of them as "module:attribute", imported when first needed
+Target = Union[BaseAlgorithm, type, str]
+
+
+def _resolve(target: Target) -> BaseAlgorithm:
+    """Create the algorithm instance described by a registry target."""
+    if isinstance(target, str):
+        module_name, _, attribute = target.partition(":")
+        target = getattr(import_module(module_name), attribute)
+    if isinstance(target, type):
+        target = target()
+    return target
+
+
+class AlgorithmRegistry(Mapping):
+    """Mapping of algorithm identifiers to algorithm instances.
+
+    Algorithms are registered by the location of their class, and their
+    module is only imported the first time their identifier is looked up.
+    Algorithms provided by other packages are registered through the entry
+    points of a group, named after their identifier, such as:
+
+        [project.entry-points."t2i.algorithms"]
+        x = "my_package.layers:MyAlgorithm"
+
+    Entry points are only searched once an identifier is not found among the
+    registered algorithms, and they cannot replace them.
+
+    This class requires the following parameters:
+        Entry point group, or None to ignore entry points
+        Targets, the algorithms registered initially
+
+    >>> registry = AlgorithmRegistry(None, {"a": "src.algorithms.base:"
+    ...                                          "BaseAlgorithm"})
+    >>> type(registry["a"]).__name__
+    'BaseAlgorithm'
+    >>> registry.get("z") is None
+    True
+    >>> registry.register("z", BaseAlgorithm)
+    >>> sorted(registry)
+    ['a', 'z']
+    """
+
+    def __init__(self, entry_point_group: Optional[str] = None,
+                 targets: Optional[Dict[str, Target]] = None):
+        self.entry_point_group = entry_point_group
+        self._targets = dict(targets or {})
+        self._instances = {}
+        self._entry_points_loaded = entry_point_group is None
+        self._lock = Lock()
+
+    def register(self, algorithm_id: str, target: Target) -> None:
+        """Add an algorithm, or replace the one using the same identifier.
+
+        The shared ciphers are dropped, see cipher.get_cipher, as their plans
+        and keystreams were compiled with the previous algorithm. Ciphers
+        created directly keep using it.
+
+        :param algorithm_id: The single character identifying the algorithm.
+        :param target: The algorithm instance, its class, or its location as
+        "module:attribute".
+        """
+        if len(algorithm_id) != 1:
+            raise ValueError("Algorithm identifiers must be one character")
+        with self._lock:
+            self._targets[algorithm_id] = target
+            self._instances.pop(algorithm_id, None)
+        # Imported here, as the cipher module imports the algorithms
+        from src.cipher import get_cipher
+
+        get_cipher.cache_clear()
+
+    def _load_entry_points(self) -> None:
+        with self._lock:
+            if self._entry_points_loaded:
+                return
+            from importlib.metadata import entry_points
+
+            for entry_point in entry_points(group=self.entry_point_group):
+                if len(entry_point.name) == 1:
+                    self._targets.setdefault(
+                        entry_point.name, entry_point.value)
+            self._entry_points_loaded = True
+
+    def __getitem__(self, algorithm_id: str) -> BaseAlgorithm:
+        instance = self._instances.get(algorithm_id)
+        if instance is not None:
+            return instance
+        if algorithm_id not in self._targets:
+            self._load_entry_points()
+        with self._lock:
+            instance = self._instances.get(algorithm_id)
+            if instance is None:
+                instance = _resolve(self._targets[algorithm_id])
+                self._instances[algorithm_id] = instance
+            return instance
+
+    def __iter__(self) -> Iterator[str]:
+        self._load_entry_points()
+        return iter(sorted(self._targets))
+
+    def __len__(self) -> int:
+        self._load_entry_points()
+        return len(self._targets)
+
+    def __contains__(self, algorithm_id: object) -> bool:
+        if algorithm_id not in self._targets:
+            self._load_entry_points()
+        return algorithm_id in self._targets
+
+
+if __name__ == "__main__":
+    import doctest
+
+    doctest.testmod()
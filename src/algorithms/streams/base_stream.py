@@ -1,7 +1,9 @@
 from typing import Generator, Optional
+from src.algorithms.base import BaseAlgorithm, Buffer
+from src.utilities import bytes_conversions
 
 
-class BaseStreamAlgorithm:
+class BaseStreamAlgorithm(BaseAlgorithm):
     """Basic interface for the encoding and decoding XOR-based algorithms.
 
     The class will return the input text as-is, without performing any modifying
@@ -10,6 +12,8 @@ class BaseStreamAlgorithm:
     This class requires no parameters.
     """
 
+    xor_based = True
+
     def stream_values(self, **kwargs) -> Generator[int, Optional[int], None]:
         """Create an integer generator that yields encoded byte values.
 
@@ -20,22 +24,46 @@ class BaseStreamAlgorithm:
         while True:
             next_val = yield next_val
 
+    def keystream(self, length: int, **kwargs) -> bytes:
+        """Obtain the byte values XOR'd with the text, all at once.
+
+        Subclasses should override this method with a bulk implementation, as
+        this one resumes the stream_values generator once per byte.
+
+        :param length: The amount of byte values to obtain.
+        :param kwargs: Optional parameters for the generator.
+        :return: The keystream, as a bytes object.
+        """
+        sv_gen = self.stream_values(**kwargs)
+        sv_gen.send(None)
+        return bytes([sv_gen.send(0) for _ in range(length)])
+
+    def keystream_at(self, start: int, length: int, **kwargs) -> bytes:
+        """Obtain the byte values XOR'd with a span of the text.
+
+        Subclasses whose values depend on their position alone should
+        override this method, as this one generates every value before the
+        span too.
+
+        :param start: The position of the first value.
+        :param length: The amount of byte values to obtain.
+        :param kwargs: Optional parameters for the generator.
+        :return: The keystream of the span, as a bytes object.
+        """
+        return self.keystream(start + length, **kwargs)[start:]
+
     def encode(self, text: bytes, **kwargs) -> bytes:
         """Encode the text using an arbitrary stream cipher.
 
         Encodes each of the bytes of the text using a byte stream generated by
-        the stream_values method.
+        the keystream method, in a single XOR operation.
 
         :param text: The bytes object to encode.
         :param kwargs: See BaseStreamAlgorithm.
         :return: The encoded text, as a bytes object.
         """
-        sv_gen = self.stream_values(**kwargs)
-        sv_gen.send(None)
-        xor_text = bytearray(text)
-        for i in range(0, len(xor_text)):
-            xor_text[i] = sv_gen.send(xor_text[i])
-        return bytes(xor_text)
+        return bytes_conversions.xor_bytes(
+            text, self.keystream(len(text), **kwargs))
 
     def decode(self, text: bytes, **kwargs) -> bytes:
         """Decode the text using an arbitrary stream cipher.
@@ -47,3 +75,22 @@ class BaseStreamAlgorithm:
         :return: The decoded text, as a bytes object.
         """
         return self.encode(text, **kwargs)
+
+    def encode_into(self, buffer: Buffer, **kwargs) -> None:
+        """Encode the text stored in a buffer, XOR'ing it in place.
+
+        :param buffer: The bytearray or writable memoryview to encode.
+        :param kwargs: See BaseStreamAlgorithm.
+        """
+        bytes_conversions.xor_into(
+            buffer, self.keystream(len(buffer), **kwargs))
+
+    def decode_into(self, buffer: Buffer, **kwargs) -> None:
+        """Decode the text stored in a buffer, XOR'ing it in place.
+
+        Symmetric operation, see encode_into() for more information.
+
+        :param buffer: The bytearray or writable memoryview to decode.
+        :param kwargs: See BaseStreamAlgorithm.
+        """
+        self.encode_into(buffer, **kwargs)
@@ -49,6 +49,44 @@ class StreamKeyAlgorithm(BaseStreamAlgorithm):
             i = (i + 1) % len(key)
             next_val = yield next_val ^ key[i]
 
+    def keystream(self, length: int, **kwargs) -> bytes:
+        """Obtain the byte values XOR'd with the text, all at once.
+
+        Repeats the key, starting from its second character, as many times as
+        required to cover the text length.
+
+        :param length: The amount of byte values to obtain.
+        :param kwargs: Optional parameters for the generator.
+        :return: The keystream, as a bytes object.
+
+        >>> StreamKeyAlgorithm().keystream(5, algorithms=bytes("abc", "ascii"))
+        b'bcabc'
+        """
+        return self.keystream_at(0, length, **kwargs)
+
+    def keystream_at(self, start: int, length: int, **kwargs) -> bytes:
+        """Obtain the byte values XOR'd with a span of the text.
+
+        The value at each position is the key character at that position,
+        modulo the key length, so the span is built without the values
+        before it.
+
+        :param start: The position of the first value.
+        :param length: The amount of byte values to obtain.
+        :param kwargs: Optional parameters for the generator.
+        :return: The keystream of the span, as a bytes object.
+
+        >>> StreamKeyAlgorithm().keystream_at(
+        ...     4, 3, algorithms=bytes("abc", "ascii"))
+        b'cab'
+        """
+        key = kwargs["algorithms"]
+        offset = start % len(key)
+        # The keystream starts from the second character of the key
+        key = key[1:] + key[:1]
+        key = key[offset:] + key[:offset]
+        return (key * (length // len(key) + 1))[:length]
+
 
 if __name__ == "__main__":
     import doctest
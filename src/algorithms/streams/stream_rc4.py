@@ -1,5 +1,5 @@
 from src.algorithms.streams.base_stream import BaseStreamAlgorithm
-from typing import Generator, Optional, List
+from typing import Generator, Optional, List, Tuple
 
 
 class StreamRC4Algorithm(BaseStreamAlgorithm):
@@ -9,6 +9,9 @@ class StreamRC4Algorithm(BaseStreamAlgorithm):
 
     This class requires the following parameters:
         Algorithm list, provided by the user
+    And optionally:
+        Bits, the amount of bits of each value, 7 by default or 8 to use
+        the whole bytes produced by RC4
 
     >>> src4a = StreamRC4Algorithm()
     >>> # seed = 0, generates int(97)
@@ -43,6 +46,7 @@ class StreamRC4Algorithm(BaseStreamAlgorithm):
         """
         next_val = yield -1
         s_boxes = self.key_scheduling(kwargs["algorithms"])
+        modulo = 2 ** kwargs.get("bits", 7)
 
         i, j = 0, 0
         while True:
@@ -54,10 +58,63 @@ class StreamRC4Algorithm(BaseStreamAlgorithm):
             s_boxes[i] = tmp
 
             # Adapt K to ascii encoding (7 bits)
-            k = s_boxes[(s_boxes[i] + s_boxes[j]) % 256] % 128
+            k = s_boxes[(s_boxes[i] + s_boxes[j]) % 256] % modulo
 
             next_val = yield next_val ^ k
 
+    def keystream(self, length: int, **kwargs) -> bytes:
+        """Obtain the byte values XOR'd with the text, all at once.
+
+        Runs the same pseudo-random generation as stream_values in a single
+        loop that fills a buffer, instead of resuming a generator per byte.
+
+        :param length: The amount of byte values to obtain.
+        :param kwargs: Optional parameters for the generator.
+        :return: The keystream, as a bytes object.
+
+        >>> StreamRC4Algorithm().keystream(3, algorithms=bytes("a", "ascii"))
+        b'\\x10<\\x18'
+        """
+        return self.keystream_from(length, **kwargs)[0]
+
+    def keystream_from(self, length: int, state: Optional[tuple] = None,
+                       **kwargs) -> Tuple[bytes, tuple]:
+        """Obtain the byte values XOR'd with the text, resuming from a state.
+
+        The state holds the S-boxes and both indexes, so generating a
+        keystream in several calls gives the same values as generating it at
+        once.
+
+        :param length: The amount of byte values to obtain.
+        :param state: The state returned by a previous call, or None to
+        start from the first value.
+        :param kwargs: Optional parameters for the generator.
+        :return: The keystream, as a bytes object, and the state after it.
+
+        >>> src4a = StreamRC4Algorithm()
+        >>> first, state = src4a.keystream_from(
+        ...     1, algorithms=bytes("a", "ascii"))
+        >>> first + src4a.keystream_from(2, state)[0]
+        b'\\x10<\\x18'
+        """
+        if state is not None:
+            s_boxes, i, j = list(state[0]), state[1], state[2]
+        else:
+            s_boxes, i, j = self.key_scheduling(kwargs["algorithms"]), 0, 0
+        mask = 2 ** kwargs.get("bits", 7) - 1
+        values = bytearray(length)
+
+        for n in range(length):
+            i = (i + 1) & 255
+            s_i = s_boxes[i]
+            j = (j + s_i) & 255
+            s_j = s_boxes[j]
+            s_boxes[i], s_boxes[j] = s_j, s_i
+
+            # Adapt K to ascii encoding (7 bits)
+            values[n] = s_boxes[(s_i + s_j) & 255] & mask
+        return bytes(values), (bytes(s_boxes), i, j)
+
     def key_scheduling(self, algorithm_list: bytes) -> List[int]:
         """Key scheduling algorithm for the RC4 implementation.
 
@@ -1,7 +1,12 @@
 from src.algorithms.streams.base_stream import BaseStreamAlgorithm
-from typing import Generator, Optional
+from typing import Generator, Optional, Tuple
 import random
 
+# Values above the range of each amount of bits, discarded from the keystream
+_DISCARDED_VALUES = {bits: bytes(range(2 ** bits, 2 ** 8)) for bits in (7, 8)}
+# Words drawn from the generator at once, as getrandbits takes a C int
+_MAX_WORDS = 2 ** 24
+
 
 class StreamSeedAlgorithm(BaseStreamAlgorithm):
     """Implementation of BaseStreamAlgorithm that streams the algorithm list.
@@ -13,6 +18,9 @@ class StreamSeedAlgorithm(BaseStreamAlgorithm):
 
     This class requires the following parameters:
         Algorithm list, provided by the user
+    And optionally:
+        Bits, the amount of bits of each value, 7 by default or 8 to draw
+        values up to 255
 
     >>> ssa = StreamSeedAlgorithm()
     >>> # seed = 0, generates int(97)
@@ -46,11 +54,77 @@ class StreamSeedAlgorithm(BaseStreamAlgorithm):
         :return: An integer generator.
         """
         next_val = yield -1
-        key = kwargs["algorithms"]
-        seed = sum([b for b in key])
-        random.seed(seed)
+        rng = random.Random(self.get_seed(**kwargs))
+        dense = kwargs.get("bits", 7) == 8
         while True:
-            next_val = yield next_val ^ random.randint(0, 2 ** 7 - 1)
+            # Dense values take every byte drawn, none is discarded
+            value = rng.getrandbits(8) if dense else rng.randint(0, 2 ** 7 - 1)
+            next_val = yield next_val ^ value
+
+    def get_seed(self, **kwargs) -> int:
+        """Calculate the random seed from the algorithm key.
+
+        :param kwargs: Optional parameters for the generator.
+        :return: The sum of each byte value of the algorithm key.
+        """
+        return sum([b for b in kwargs["algorithms"]])
+
+    def keystream(self, length: int, **kwargs) -> bytes:
+        """Obtain the byte values XOR'd with the text, all at once.
+
+        Generates the same values as calling randint(0, 127) once per byte.
+        That call draws 8 random bits from a 32-bit word of the generator and
+        discards values above 127, so the keystream is obtained by drawing
+        whole words at once, keeping their most significant byte and deleting
+        the values above 127. With 8 bits, the values are those of
+        getrandbits(8), which keeps every most significant byte.
+
+        :param length: The amount of byte values to obtain.
+        :param kwargs: Optional parameters for the generator.
+        :return: The keystream, as a bytes object.
+
+        >>> ssa = StreamSeedAlgorithm()
+        >>> ssa.keystream(3, algorithms=bytes("a", "ascii"))
+        b'1m_'
+        """
+        return self.keystream_from(length, **kwargs)[0]
+
+    def keystream_from(self, length: int, state: Optional[tuple] = None,
+                       **kwargs) -> Tuple[bytes, tuple]:
+        """Obtain the byte values XOR'd with the text, resuming from a state.
+
+        The state holds the generator state and the values already drawn but
+        not returned yet, so generating a keystream in several calls gives
+        the same values as generating it at once.
+
+        :param length: The amount of byte values to obtain.
+        :param state: The state returned by a previous call, or None to
+        start from the first value.
+        :param kwargs: Optional parameters for the generator.
+        :return: The keystream, as a bytes object, and the state after it.
+
+        >>> ssa = StreamSeedAlgorithm()
+        >>> first, state = ssa.keystream_from(
+        ...     1, algorithms=bytes("a", "ascii"))
+        >>> first + ssa.keystream_from(2, state)[0]
+        b'1m_'
+        """
+        rng = random.Random()
+        if state is None:
+            rng.seed(self.get_seed(**kwargs))
+            values = bytearray()
+        else:
+            rng.setstate(state[0])
+            values = bytearray(state[1])
+        bits = kwargs.get("bits", 7)
+        while len(values) < length:
+            # Around half the 7-bit values are discarded, draw twice as many
+            # words for them
+            words = min(2 ** (8 - bits) * (length - len(values)) + 16,
+                        _MAX_WORDS)
+            words = rng.getrandbits(32 * words).to_bytes(4 * words, "little")
+            values += words[3::4].translate(None, _DISCARDED_VALUES[bits])
+        return bytes(values[:length]), (rng.getstate(), bytes(values[length:]))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,200 @@
+from concurrent.futures import ProcessPoolExecutor
+from glob import glob
+from typing import List, NamedTuple, Optional
+import json
+import os
+import time
+from src import decoder, encoder
+from src.utilities import image_formats
+from src.utilities.file_io import atomic_write
+
+input_extensions = {"encode": ("txt",),
+                    "decode": image_formats.image_extensions}
+_default_format = image_formats.formats[image_formats.default_format]
+
+
+class BatchResult(NamedTuple):
+    """Outcome of processing a single file of a batch."""
+    input_file: str
+    output_file: Optional[str]
+    error: Optional[str]
+    seconds: float
+
+
+def find_inputs(source: str, mode: str) -> List[str]:
+    """List the files to process from a directory, glob pattern or manifest.
+
+    :param source: A directory, a glob pattern, or a manifest file name
+    preceded by "@", listing one file per line.
+    :param mode: Either "encode" or "decode".
+    :return: The list of files to process.
+    """
+    if source.startswith("@"):
+        with open(source[1:], "r") as f:
+            return [line.strip() for line in f if line.strip()]
+    if os.path.isdir(source):
+        suffixes = tuple(f".{e}" for e in input_extensions[mode])
+        return sorted(file_name
+                      for file_name in glob(os.path.join(source, "*"))
+                      if file_name.lower().endswith(suffixes))
+    return sorted(glob(source))
+
+
+def get_output_file(input_file: str, mode: str,
+                    output_dir: Optional[str] = None,
+                    image_format: image_formats.ImageFormat = _default_format
+                    ) -> str:
+    """Determine the output file for an input file.
+
+    :param input_file: The file to process.
+    :param mode: Either "encode" or "decode".
+    :param output_dir: The directory for the output file. Defaults to the
+    directory of the input file.
+    :param image_format: The format of the images written when encoding.
+    :return: The output file name.
+
+    >>> get_output_file("texts/a.txt", "encode")
+    'texts/a.png'
+    >>> get_output_file("texts/a.bmp", "decode", "out")
+    'out/a.txt'
+    >>> get_output_file("./a.txt", "encode")
+    './a.png'
+    >>> get_output_file("../data.v2/a.png", "decode")
+    '../data.v2/a.txt'
+    """
+    # Get input file path and name without the file extension
+    file_id = os.path.splitext(input_file)[0]
+    if output_dir is not None:
+        file_id = os.path.join(output_dir, os.path.basename(file_id))
+    extension = image_format.extension if mode == "encode" else "txt"
+    return f"{file_id}.{extension}"
+
+
+def process_file(input_file: str, mode: str, algorithm_list: bytes,
+                 output_dir: Optional[str] = None,
+                 image_format: image_formats.ImageFormat = _default_format
+                 ) -> BatchResult:
+    """Encode or decode a single file, writing the result atomically.
+
+    Errors are not raised but stored in the result, so a failing file does
+    not stop the rest of the batch.
+
+    :param input_file: The file to process.
+    :param mode: Either "encode" or "decode".
+    :param algorithm_list: A list of algorithm identifiers.
+    :param output_dir: The directory for the output file.
+    :param image_format: The format of the images written when encoding.
+    :return: The outcome of processing the file.
+    """
+    start = time.perf_counter()
+    output_file = get_output_file(input_file, mode, output_dir, image_format)
+    try:
+        if mode == "encode":
+            encoded_data = encoder.encode_file(input_file, algorithm_list)
+            with atomic_write(output_file, "wb") as f:
+                image_formats.write_image_data(encoded_data, f, image_format)
+        else:
+            with atomic_write(output_file, "wb") as f:
+                decoder.write_text(decoder.iter_decode_file(
+                    input_file, algorithm_list), f)
+    except Exception as e:
+        return BatchResult(input_file, None, f"{type(e).__name__}: {e}",
+                           time.perf_counter() - start)
+    return BatchResult(input_file, output_file, None,
+                       time.perf_counter() - start)
+
+
+def run_batch(input_files: List[str], mode: str, algorithm_list: bytes,
+              output_dir: Optional[str] = None,
+              max_workers: Optional[int] = None,
+              chunk_size: Optional[int] = None,
+              image_format: image_formats.ImageFormat = _default_format
+              ) -> List[BatchResult]:
+    """Encode or decode a list of files across a pool of worker processes.
+
+    Files are sent to the workers in chunks, which reduces the communication
+    overhead for batches of many small files.
+
+    :param input_files: The files to process.
+    :param mode: Either "encode" or "decode".
+    :param algorithm_list: A list of algorithm identifiers.
+    :param output_dir: The directory for the output files. Defaults to the
+    directory of each input file.
+    :param max_workers: The amount of worker processes.
+    :param chunk_size: The amount of files sent to a worker at once.
+    :param image_format: The format of the images written when encoding.
+    :return: The outcome of processing each file, in order.
+    """
+    if mode not in input_extensions:
+        raise ValueError(f"Unknown batch mode {mode}")
+    if output_dir is not None:
+        os.makedirs(output_dir, exist_ok=True)
+
+    workers = max_workers or os.cpu_count() or 1
+    if chunk_size is None:
+        # A few chunks per worker balance the load between them
+        chunk_size = max(len(input_files) // (workers * 4), 1)
+
+    count = len(input_files)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(
+            process_file, input_files, [mode] * count,
+            [algorithm_list] * count, [output_dir] * count,
+            [image_format] * count, chunksize=chunk_size))
+
+
+def write_report(results: List[BatchResult], report_file: str) -> None:
+    """Store the outcome of a batch as a JSON list.
+
+    :param results: The outcome of processing each file.
+    :param report_file: The file to write the report to.
+    """
+    with atomic_write(report_file, "w") as f:
+        json.dump([result._asdict() for result in results], f, indent=2)
+
+
+def print_help(exec_name: str) -> None:
+    """Display help in console."""
+    print(f"""
+    Text to image encryption algorithm - Batch processing
+
+         Usage: python3 {exec_name} <encode|decode> <source> <password>
+                        [output directory] [workers] [format]
+
+    The source is either a directory, a glob pattern (quoted, so the shell
+    does not expand it) or a manifest file name preceded by "@", listing one
+    file per line. Directories are searched for .txt files when encoding and
+    image files (.png, .bmp, .tiff or .ppm) when decoding.
+    Images are written as PNG, unless another format is given, see the
+    encoding script for the available ones.
+    Files are processed in parallel and each output is only written once it
+    is complete. A report with the outcome of every file is stored in the
+    output directory, or the current directory, as "batch_report.json".
+    """)
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) < 4 or sys.argv[1] not in input_extensions:
+        print_help(sys.argv[0])
+    else:
+        batch_mode = sys.argv[1]
+        batch_output = sys.argv[4] if len(sys.argv) > 4 else None
+        batch_workers = int(sys.argv[5]) if len(sys.argv) > 5 else None
+        batch_format = image_formats.get_format(
+            sys.argv[6] if len(sys.argv) > 6 else image_formats.default_format)
+
+        batch_results = run_batch(
+            find_inputs(sys.argv[2], batch_mode), batch_mode,
+            bytes(sys.argv[3], "ascii"), batch_output, batch_workers,
+            image_format=batch_format)
+        write_report(batch_results, os.path.join(
+            batch_output or os.curdir, "batch_report.json"))
+
+        failed = [r for r in batch_results if r.error is not None]
+        for result in failed:
+            print(f"{result.input_file}: {result.error}")
+        print(f"{len(batch_results) - len(failed)} succeeded, "
+              f"{len(failed)} failed")
+        sys.exit(1 if failed else 0)
@@ -0,0 +1,158 @@
+from typing import Callable, List, NamedTuple, Optional
+import io
+import os
+import random
+import tempfile
+from src import algorithms as algo
+from src import decoder, encoder
+from src.cipher import get_cipher
+from src.utilities import compression, image_conversions, image_formats
+
+representative_passwords = [
+    bytes("coolproject", "ascii"),
+    bytes("b3dhgfce", "ascii"),
+    bytes("hgfhgfhgfb1b2b3", "ascii"),
+]
+
+_SEVEN_BITS = bytes([byte & 127 for byte in range(256)])
+# Removed along with its contents when the interpreter exits
+_work_directory = tempfile.TemporaryDirectory(prefix="t2i-bench-")
+
+
+class BenchmarkCase(NamedTuple):
+    """Operation measured by the benchmarks.
+
+    The setup function receives the payload and returns the function to
+    measure, which takes no arguments. Payloads longer than the maximum size
+    are skipped, as some operations cannot handle them.
+    """
+    name: str
+    setup: Callable[[bytes], Callable[[], object]]
+    max_size: Optional[int] = None
+
+
+def make_payload(size: int, seed: int = 0) -> bytes:
+    """Generate a reproducible ASCII payload.
+
+    :param size: The amount of bytes of the payload.
+    :param seed: The seed of the random generator.
+    :return: The payload.
+
+    >>> make_payload(8) == make_payload(8)
+    True
+    >>> max(make_payload(1000)) < 128
+    True
+    """
+    return random.Random(seed).randbytes(size).translate(_SEVEN_BITS)
+
+
+def _algorithm_case(algorithm_id: str) -> BenchmarkCase:
+    algorithm_object = algo.algo_dict[algorithm_id]
+    # Digits after the algorithm are parameters for some algorithms
+    algorithm_list = bytes(f"{algorithm_id}3", "ascii")
+
+    def setup(payload: bytes) -> Callable[[], bytes]:
+        return lambda: algorithm_object.encode(
+            payload, algorithms=algorithm_list, index=0)
+
+    return BenchmarkCase(f"algorithm:{algorithm_id}", setup)
+
+
+def _file_cases(algorithm_list: bytes) -> List[BenchmarkCase]:
+    password = algorithm_list.decode("ascii")
+
+    def setup_encode(payload: bytes) -> Callable[[], object]:
+        text_file = os.path.join(_work_directory.name, "encode.txt")
+        image_file = os.path.join(_work_directory.name, "encode.png")
+        with open(text_file, "wb") as f:
+            f.write(payload)
+
+        def run():
+            encoded_data = encoder.encode_file(text_file, algorithm_list)
+            image_formats.write_image_data(encoded_data, image_file)
+
+        return run
+
+    def setup_decode(payload: bytes) -> Callable[[], bytes]:
+        image_file = os.path.join(_work_directory.name, "decode.png")
+        encoded_data = encoder.randomize_msb(
+            get_cipher(algorithm_list).encode(payload))
+        image_formats.write_image_data(encoded_data, image_file)
+        return lambda: decoder.decode_file(image_file, algorithm_list)
+
+    max_size = image_conversions.get_max_data_length()
+    return [BenchmarkCase(f"encode_file:{password}", setup_encode, max_size),
+            BenchmarkCase(f"decode_file:{password}", setup_decode, max_size)]
+
+
+def _image_cases() -> List[BenchmarkCase]:
+    def setup_to_image(payload: bytes) -> Callable[[], object]:
+        return lambda: image_conversions.bytes_to_image(bytearray(payload))
+
+    def setup_to_bytes(payload: bytes) -> Callable[[], bytearray]:
+        image = image_conversions.bytes_to_image(bytearray(payload))
+        return lambda: image_conversions.image_to_bytes(image)
+
+    def setup_write(payload: bytes) -> Callable[[], None]:
+        return lambda: image_formats.write_image_data(
+            bytearray(payload), io.BytesIO())
+
+    def setup_read(payload: bytes) -> Callable[[], bytearray]:
+        image_file = io.BytesIO()
+        image_formats.write_image_data(bytearray(payload), image_file)
+
+        def run():
+            image_file.seek(0)
+            return image_formats.read_image_data(image_file)
+
+        return run
+
+    max_size = image_conversions.get_max_data_length()
+    return [BenchmarkCase("bytes_to_image", setup_to_image, max_size),
+            BenchmarkCase("image_to_bytes", setup_to_bytes, max_size),
+            BenchmarkCase("write_image_data", setup_write, max_size),
+            BenchmarkCase("read_image_data", setup_read, max_size)]
+
+
+def _writer_case(spec: str) -> BenchmarkCase:
+    image_format = image_formats.get_format(spec)
+
+    def setup(payload: bytes) -> Callable[[], None]:
+        image = image_conversions.bytes_to_image(bytearray(payload))
+        return lambda: image_formats.save_image(
+            image, io.BytesIO(), image_format)
+
+    max_size = image_conversions.get_max_data_length()
+    return BenchmarkCase(f"save:{spec}", setup, max_size)
+
+
+def _compression_case(spec: str) -> BenchmarkCase:
+    codec = compression.get_compression(spec)
+
+    def setup(payload: bytes) -> Callable[[], bytes]:
+        return lambda: codec.compress(payload)
+
+    return BenchmarkCase(f"compress:{spec}", setup)
+
+
+def get_cases() -> List[BenchmarkCase]:
+    """List every benchmark case.
+
+    :return: The cases for each algorithm, each representative password,
+    the image conversions, the image writers and the compression codecs.
+    """
+    cases = [_algorithm_case(algorithm_id) for algorithm_id in algo.algo_dict]
+    for algorithm_list in representative_passwords:
+        cases.extend(_file_cases(algorithm_list))
+    cases.extend(_image_cases())
+    cases.extend(_writer_case(spec) for spec in ("png", "png:0", "png:1",
+                                                 "bmp", "tiff", "ppm"))
+    cases.extend(_compression_case(spec) for spec in ("zlib:1", "zlib",
+                                                      "lzma", "bz2"))
+    return cases
+
+
+if __name__ == "__main__":
+    import doctest
+
+    doctest.testmod()
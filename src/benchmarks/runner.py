@@ -0,0 +1,187 @@
+from typing import Callable, Dict, List, Optional
+import json
+import math
+import platform
+import time
+import tracemalloc
+from src.benchmarks.cases import BenchmarkCase, get_cases, make_payload
+
+default_sizes = [2 ** 10, 10 * 2 ** 10, 100 * 2 ** 10,
+                 2 ** 20, 10 * 2 ** 20, 100 * 2 ** 20]
+default_threshold = 0.1
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """Obtain a percentile of a list of values, by the nearest-rank method.
+
+    :param values: The values, in any order.
+    :param fraction: The percentile, between 0 and 1.
+    :return: The value at the percentile.
+
+    >>> percentile([4, 1, 3, 2], 0.5)
+    2
+    >>> percentile([4, 1, 3, 2], 0.99)
+    4
+    """
+    ordered = sorted(values)
+    rank = max(math.ceil(fraction * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+def measure(function: Callable[[], object], size: int, repeat: int) -> dict:
+    """Measure the latency, throughput and peak memory of a function.
+
+    The function is timed several times first. Then, it is run once more
+    while tracing memory allocations, as tracing slows the execution down.
+
+    :param function: The function to measure, without arguments.
+    :param size: The amount of payload bytes processed by the function.
+    :param repeat: The amount of timed runs.
+    :return: The measurements, with times in seconds and sizes in bytes.
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        function()
+        _, peak_memory = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    median = percentile(timings, 0.5)
+    return {
+        "latency": {
+            "min": min(timings),
+            "p50": median,
+            "p90": percentile(timings, 0.9),
+            "p99": percentile(timings, 0.99),
+            "max": max(timings),
+        },
+        "throughput": size / median if median else None,
+        "peak_memory": peak_memory,
+    }
+
+
+def run_benchmarks(sizes: List[int], repeat: int = 5,
+                   name_filter: Optional[str] = None,
+                   cases: Optional[List[BenchmarkCase]] = None,
+                   log: Callable[[str], None] = print) -> dict:
+    """Run the benchmark cases over a range of payload sizes.
+
+    :param sizes: The payload sizes, in bytes.
+    :param repeat: The amount of timed runs for each case and size.
+    :param name_filter: Only run the cases whose name contains this text.
+    :param cases: The cases to run. Defaults to every case.
+    :param log: Function receiving a line of progress for each measurement.
+    :return: The results, along with information about the environment.
+    """
+    results = []
+    for size in sizes:
+        payload = make_payload(size)
+        for case in cases or get_cases():
+            if name_filter and name_filter not in case.name:
+                continue
+            if case.max_size is not None and size > case.max_size:
+                continue
+            result = measure(case.setup(payload), size, repeat)
+            result.update(case=case.name, size=size, repeat=repeat)
+            results.append(result)
+            log(f"{case.name:<32} {size:>10} B "
+                f"p50 {result['latency']['p50'] * 1000:10.3f} ms "
+                f"peak {result['peak_memory'] / 2 ** 20:8.2f} MiB")
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "results": results,
+    }
+
+
+def compare(baseline: dict, current: dict,
+            threshold: float = default_threshold) -> List[Dict]:
+    """Find the measurements that got slower or used more memory.
+
+    Measurements are matched by case name and payload size. Only the ones
+    present in both runs are compared.
+
+    :param baseline: The stored benchmark results.
+    :param current: The new benchmark results.
+    :param threshold: The relative increase considered a regression.
+    :return: The regressions, with the metric and both values.
+
+    >>> old = {"results": [{"case": "x", "size": 1, "peak_memory": 10,
+    ...                     "latency": {"p50": 1.0}}]}
+    >>> new = {"results": [{"case": "x", "size": 1, "peak_memory": 10,
+    ...                     "latency": {"p50": 1.5}}]}
+    >>> compare(old, new)
+    [{'case': 'x', 'size': 1, 'metric': 'p50', 'baseline': 1.0, 'current': 1.5}]
+    >>> compare(old, old)
+    []
+    """
+    stored = {(r["case"], r["size"]): r for r in baseline["results"]}
+    regressions = []
+    for result in current["results"]:
+        old = stored.get((result["case"], result["size"]))
+        if old is None:
+            continue
+        metrics = [("p50", old["latency"]["p50"], result["latency"]["p50"]),
+                   ("peak_memory", old["peak_memory"], result["peak_memory"])]
+        for metric, old_value, new_value in metrics:
+            if new_value > old_value * (1 + threshold):
+                regressions.append({
+                    "case": result["case"], "size": result["size"],
+                    "metric": metric, "baseline": old_value,
+                    "current": new_value})
+    return regressions
+
+
+def main(arguments: Optional[List[str]] = None) -> int:
+    """Run the benchmarks from the command line.
+
+    :param arguments: The command line arguments, without the program name.
+    :return: The exit status, 1 if regressions were found.
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Measure the performance of the algorithms, the "
+                    "encoding and decoding pipelines and the image "
+                    "conversions.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=default_sizes,
+                        help="payload sizes in bytes")
+    parser.add_argument("--repeat", type=int, default=5,
+                        help="timed runs for each case and size")
+    parser.add_argument("--filter", dest="name_filter",
+                        help="only run cases whose name contains this text")
+    parser.add_argument("--output", help="store the results in a JSON file")
+    parser.add_argument("--compare", metavar="BASELINE",
+                        help="flag regressions against stored results")
+    parser.add_argument("--threshold", type=float, default=default_threshold,
+                        help="relative increase considered a regression")
+    args = parser.parse_args(arguments)
+
+    results = run_benchmarks(args.sizes, args.repeat, args.name_filter)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.compare:
+        with open(args.compare, "r") as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, results, args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression['case']} {regression['size']} B "
+                  f"{regression['metric']}: {regression['baseline']:.6g} -> "
+                  f"{regression['current']:.6g}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    import sys
+
+    sys.exit(main())
@@ -0,0 +1,271 @@
+from collections import OrderedDict
+from functools import lru_cache
+from threading import Lock
+from typing import Optional
+from src import algorithms as algo
+from src.algorithms import plan
+
+default_cache_size = 4 * 2 ** 20
+checkpoint_interval = 2 ** 12
+# Memory charged against the cache size for each checkpoint, as a seeded
+# generator state takes about 24 KiB and an RC4 state less than 1 KiB
+checkpoint_size = 2 ** 15
+
+
+class Cipher(plan.Plan):
+    """Reusable session that encodes and decodes texts with a single password.
+
+    The password is compiled into its minimal plan once, when the object is
+    created. The keystream of every XOR-based layer is kept so later texts
+    only generate the values past the longest text seen so far. The stored
+    keystreams are bounded in size, dropping the least recently used ones
+    first. RC4 and seeded layers keep the state of their generator before
+    the first value, so their key schedule is computed once. When decoding
+    a span of a text, see Plan.decode_range, they also keep the state at
+    regular intervals, so later spans resume their keystream close to them. Each
+    checkpoint is charged checkpoint_size bytes against the cache size,
+    dropping the checkpoints of the least recently used algorithm first.
+
+    A Cipher can be shared between threads: the stored keystreams are only
+    accessed while holding a lock, and keystreams are generated without it.
+
+    This class requires the following parameters:
+        Algorithm list, provided by the user
+        Cache size, the maximum amount of keystream bytes to keep
+        Bits, the amount of bits of each byte, see plan.Plan
+
+    >>> cipher = Cipher(bytes("b3hfgc", "ascii"))
+    >>> encoded = cipher.encode(bytes("Hello world", "ascii"))
+    >>> cipher.decode(encoded)
+    b'Hello world'
+    >>> encoded == plan.compile_plan(bytes("b3hfgc", "ascii")).encode(
+    ...     bytes("Hello world", "ascii"))
+    True
+    """
+
+    def __init__(self, algorithm_list: bytes,
+                 cache_size: int = default_cache_size, bits: int = 7):
+        compiled_plan = plan.compile_plan(algorithm_list, bits)
+        super().__init__(algorithm_list, compiled_plan.steps, bits)
+        self.cache_size = cache_size
+        self._keystreams = OrderedDict()
+        # Interval and generator states at every multiple of it, per algorithm
+        self._checkpoints = OrderedDict()
+        self._lock = Lock()
+
+    def __repr__(self) -> str:
+        if self.bits != 7:
+            return f"Cipher({self.algorithm_list!r}, bits={self.bits})"
+        return f"Cipher({self.algorithm_list!r})"
+
+    def keystream(self, algorithm_id: str, length: int) -> bytes:
+        """Obtain the values XOR'd with the text by a single algorithm.
+
+        Serves the values from the stored keystream when it is long enough.
+        Otherwise, the whole keystream is generated at once, see
+        Plan.keystream, and stored. Algorithms that can resume their
+        keystream start from their first checkpoint, so the RC4 key schedule
+        and the seeded generator are computed once per Cipher.
+
+        :param algorithm_id: The algorithm identifier.
+        :param length: The amount of values to obtain.
+        :return: The keystream, as a bytes object.
+        """
+        keystream = self._stored_keystream(algorithm_id, 0, length)
+        if keystream is not None:
+            return keystream
+        algorithm_object = algo.algo_dict[algorithm_id]
+        if hasattr(algorithm_object, "keystream_from"):
+            keystream = algorithm_object.keystream_from(
+                length, self._first_checkpoint(algorithm_object, algorithm_id),
+                bits=self.bits)[0]
+        else:
+            keystream = super().keystream(algorithm_id, length)
+        with self._lock:
+            self._store_keystream(algorithm_id, keystream)
+        return keystream
+
+    def keystream_range(self, algorithm_id: str, start: int,
+                        length: int) -> bytes:
+        """Obtain the values XOR'd with a span of the text by an algorithm.
+
+        Serves the values from the stored keystream when it covers the span.
+        Otherwise, algorithms that can resume their keystream generate it
+        from the nearest checkpoint before the span, see _resume_keystream.
+
+        :param algorithm_id: The algorithm identifier.
+        :param start: The position of the first value.
+        :param length: The amount of values to obtain.
+        :return: The keystream of the span, as a bytes object.
+        """
+        keystream = self._stored_keystream(algorithm_id, start, length)
+        if keystream is not None:
+            return keystream
+
+        algorithm_object = algo.algo_dict[algorithm_id]
+        if hasattr(algorithm_object, "keystream_from"):
+            return self._resume_keystream(
+                algorithm_object, algorithm_id, start, length)
+        return super().keystream_range(algorithm_id, start, length)
+
+    def _stored_keystream(self, algorithm_id: str, start: int,
+                          length: int) -> Optional[bytes]:
+        """Obtain a span of a stored keystream, if it covers the span.
+
+        :param algorithm_id: The algorithm identifier.
+        :param start: The position of the first value.
+        :param length: The amount of values to obtain.
+        :return: The keystream of the span, or None if it is not stored.
+        """
+        with self._lock:
+            keystream = self._keystreams.get(algorithm_id)
+            if keystream is None or len(keystream) < start + length:
+                return None
+            self._keystreams.move_to_end(algorithm_id)
+            return keystream[start:start + length]
+
+    def _resume_keystream(self, algorithm_object, algorithm_id: str,
+                          start: int, length: int) -> bytes:
+        """Generate a span of a keystream from the nearest checkpoint.
+
+        The generator state is kept every checkpoint_interval values before
+        the span, so later spans skip every value before the nearest one.
+        When the checkpoints no longer fit in the cache size, every other
+        one is dropped and the interval doubles, so they still cover the
+        whole keystream. The first checkpoint holds the RC4 key schedule or
+        the seeded generator, which are then computed once per Cipher.
+
+        Checkpoints are only kept in memory, as they reveal the keystream.
+
+        :param algorithm_object: The algorithm, providing keystream_from.
+        :param algorithm_id: The algorithm identifier.
+        :param start: The position of the first value.
+        :param length: The amount of values to obtain.
+        :return: The keystream of the span, as a bytes object.
+        """
+        limit = self._checkpoint_limit()
+        with self._lock:
+            interval, checkpoints = self._checkpoints.get(
+                algorithm_id, (checkpoint_interval, []))
+            checkpoints = list(checkpoints)
+        if not checkpoints:
+            checkpoints.append(
+                self._first_checkpoint(algorithm_object, algorithm_id))
+
+        block = min(start // interval, len(checkpoints) - 1)
+        position = block * interval
+        state = checkpoints[block]
+        # Only the last checkpoint can be followed by new ones before the span
+        next_position = len(checkpoints) * interval
+        while next_position <= start:
+            state = algorithm_object.keystream_from(
+                next_position - position, state, bits=self.bits)[1]
+            position = next_position
+            checkpoints.append(state)
+            if len(checkpoints) > limit:
+                checkpoints = checkpoints[::2]
+                interval *= 2
+            next_position = len(checkpoints) * interval
+        values = algorithm_object.keystream_from(
+            start + length - position, state, bits=self.bits)[0]
+
+        with self._lock:
+            stored_interval, stored = self._checkpoints.pop(
+                algorithm_id, (interval, ()))
+            if stored_interval * len(stored) > interval * len(checkpoints):
+                # Another thread stored further checkpoints meanwhile
+                interval, checkpoints = stored_interval, stored
+            self._store_checkpoints(algorithm_id, interval, checkpoints)
+        return values[start - position:]
+
+    def _first_checkpoint(self, algorithm_object, algorithm_id: str) -> tuple:
+        """Obtain the generator state before the first value of a keystream.
+
+        The state is computed once and kept as the first checkpoint of the
+        algorithm, see _resume_keystream.
+
+        :param algorithm_object: The algorithm, providing keystream_from.
+        :param algorithm_id: The algorithm identifier.
+        :return: The state, as returned by keystream_from.
+        """
+        with self._lock:
+            if algorithm_id in self._checkpoints:
+                self._checkpoints.move_to_end(algorithm_id)
+                return self._checkpoints[algorithm_id][1][0]
+        state = algorithm_object.keystream_from(
+            0, algorithms=self.algorithm_list, bits=self.bits)[1]
+        with self._lock:
+            if algorithm_id not in self._checkpoints:
+                self._store_checkpoints(
+                    algorithm_id, checkpoint_interval, [state])
+        return state
+
+    def _checkpoint_limit(self) -> int:
+        """Calculate the amount of checkpoints that fit in the cache size."""
+        return max(self.cache_size // checkpoint_size, 2)
+
+    def _store_checkpoints(self, algorithm_id: str, interval: int,
+                           checkpoints: list) -> None:
+        """Store the checkpoints of an algorithm, dropping the least recently
+        used algorithms to fit.
+
+        The caller must hold the lock.
+        :param algorithm_id: The algorithm identifier.
+        :param interval: The amount of values between checkpoints.
+        :param checkpoints: The generator states at every multiple of it.
+        """
+        self._checkpoints[algorithm_id] = (interval, checkpoints)
+        count = sum(len(c) for _, c in self._checkpoints.values())
+        while count > self._checkpoint_limit():
+            _, (_, dropped) = self._checkpoints.popitem(last=False)
+            count -= len(dropped)
+
+    def clear_cache(self) -> None:
+        """Drop every stored keystream and checkpoint."""
+        with self._lock:
+            self._keystreams.clear()
+            self._checkpoints.clear()
+
+    def _store_keystream(self, algorithm_id: str, keystream: bytes) -> None:
+        """Store a keystream, dropping the least recently used ones to fit.
+
+        The caller must hold the lock.
+
+        :param algorithm_id: The algorithm identifier.
+        :param keystream: The keystream to store.
+        """
+        stored = self._keystreams.get(algorithm_id)
+        if stored is not None and len(stored) >= len(keystream):
+            # Another thread stored a longer keystream meanwhile
+            return
+        self._keystreams.pop(algorithm_id, None)
+        if len(keystream) > self.cache_size:
+            return
+        stored = sum(len(k) for k in self._keystreams.values())
+        while self._keystreams and stored + len(keystream) > self.cache_size:
+            _, dropped = self._keystreams.popitem(last=False)
+            stored -= len(dropped)
+        self._keystreams[algorithm_id] = keystream
+
+
+@lru_cache(maxsize=16)
+def get_cipher(algorithm_list: bytes, bits: int = 7) -> Cipher:
+    """Obtain a shared Cipher for the algorithm list.
+
+    The most recently used passwords keep their Cipher, so repeated calls
+    with the same password reuse the compiled plan and stored keystreams.
+
+    :param algorithm_list: The list of algorithm identifiers.
+    :param bits: The amount of bits of each byte, see plan.Plan.
+    :return: The Cipher for the algorithm list.
+
+    >>> get_cipher(bytes("fh", "ascii")) is get_cipher(bytes("fh", "ascii"))
+    True
+    """
+    return Cipher(algorithm_list, bits=bits)
+
+
+if __name__ == "__main__":
+    import doctest
+
+    doctest.testmod()
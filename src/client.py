@@ -0,0 +1,132 @@
+from typing import Iterable, List, Tuple
+import socket
+from src.utilities import protocol
+
+
+class DaemonError(Exception):
+    """Error reported by the daemon while processing a request."""
+
+
+class DaemonClient:
+    """Connection to a running daemon, see src/daemon.py.
+
+    The client only depends on the standard library, so it starts faster
+    than the encoding and decoding scripts. Requests can be sent one by one,
+    or pipelined so the daemon processes them concurrently.
+
+    This class requires the following parameters:
+        Socket path, where the daemon listens
+    """
+
+    def __init__(self, socket_path: str = protocol.default_socket_path):
+        self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.socket.connect(socket_path)
+        self.stream = self.socket.makefile("rb")
+        self.next_id = 0
+
+    def close(self) -> None:
+        """Close the connection with the daemon."""
+        self.stream.close()
+        self.socket.close()
+
+    def __enter__(self) -> "DaemonClient":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def send(self, operation: str, password: bytes = bytes(),
+             payload: bytes = bytes()) -> int:
+        """Send a request without waiting for its response.
+
+        :param operation: Either "encode", "decode" or "stats".
+        :param password: A list of algorithm identifiers.
+        :param payload: The text to encode or the PNG image to decode.
+        :return: The identifier of the request.
+        """
+        request_id = self.next_id
+        self.next_id += 1
+        header = {"id": request_id, "op": operation,
+                  "password": password.decode("ascii")}
+        self.socket.sendall(protocol.pack_message(header, payload))
+        return request_id
+
+    def receive(self) -> Tuple[dict, bytes]:
+        """Wait for the next response, of any pending request.
+
+        :return: A tuple containing the header and payload of the response.
+        """
+        return protocol.read_message(self.stream)
+
+    def request(self, operation: str, password: bytes = bytes(),
+                payload: bytes = bytes()) -> Tuple[dict, bytes]:
+        """Send a request and wait for its response.
+
+        :param operation: Either "encode", "decode" or "stats".
+        :param password: A list of algorithm identifiers.
+        :param payload: The text to encode or the PNG image to decode.
+        :return: A tuple containing the header and payload of the response.
+        """
+        return self.pipeline([(operation, password, payload)])[0]
+
+    def pipeline(self, requests: Iterable[Tuple[str, bytes, bytes]]
+                 ) -> List[Tuple[dict, bytes]]:
+        """Send several requests at once and wait for all their responses.
+
+        :param requests: Tuples of operation, password and payload.
+        :return: The header and payload of each response, in the order of
+        the requests.
+        """
+        request_ids = [self.send(*request) for request in requests]
+        responses = {}
+        while len(responses) < len(request_ids):
+            header, payload = self.receive()
+            responses[header["id"]] = (header, payload)
+
+        for header, _ in responses.values():
+            if not header["ok"]:
+                raise DaemonError(header["error"])
+        return [responses[request_id] for request_id in request_ids]
+
+
+def print_help(exec_name: str) -> None:
+    """Display help in console."""
+    print(f"""
+    Text to image encryption algorithm - Daemon client
+
+         Usage: python3 {exec_name} encode <file name> <password>
+                python3 {exec_name} decode <file name> <password>
+                python3 {exec_name} stats
+
+    Works like src/encoder.py and src/decoder.py, storing the output next to
+    the input file, but sends the work to a running daemon (src/daemon.py).
+    The latency of the request and the amount of requests in progress are
+    displayed once done. The daemon socket is taken from the T2I_SOCKET
+    environment variable, or "{protocol.default_socket_path}".
+    """)
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) >= 2 and sys.argv[1] == "stats":
+        with DaemonClient() as client:
+            print(client.request("stats")[0])
+    elif len(sys.argv) < 4 or sys.argv[1] not in ("encode", "decode"):
+        print_help(sys.argv[0])
+    else:
+        mode, file_name = sys.argv[1], sys.argv[2]
+        with open(file_name, "rb") as f:
+            input_data = f.read()
+
+        with DaemonClient() as client:
+            response, output_data = client.request(
+                mode, bytes(sys.argv[3], "ascii"), input_data)
+
+        # Get input file path and name without the file extension
+        file_id = ''.join(file_name.split(".")[:-1])
+        extension = "png" if mode == "encode" else "txt"
+        with open(f"{file_id}.{extension}", "wb") as f:
+            f.write(output_data)
+        sys.stderr.write(f"latency {response['latency'] * 1000:.3f} ms, "
+                         f"queue depth {response['queue_depth']}\n")
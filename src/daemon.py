@@ -0,0 +1,227 @@
+from concurrent.futures import ProcessPoolExecutor
+from time import perf_counter
+from typing import Optional
+import asyncio
+import os
+import signal
+import socket
+import stat
+from PIL import Image
+from src import engine
+from src.utilities import protocol
+
+
+def _warm_up() -> None:
+    """Load the image plugins of a worker before the first request."""
+    Image.init()
+
+
+operations = {
+    "encode": engine.encode_image,
+    "decode": engine.decode_image,
+}
+
+
+class SocketInUseError(RuntimeError):
+    """Raised when another process already listens on the socket path."""
+
+
+def is_listening(socket_path: str) -> bool:
+    """Check whether a process accepts connections on a Unix domain socket.
+
+    :param socket_path: The path of the socket.
+    :return: True if a connection succeeds.
+
+    >>> import os, tempfile
+    >>> is_listening(os.path.join(tempfile.mkdtemp(), "t2i.sock"))
+    False
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+        try:
+            connection.connect(socket_path)
+        except (FileNotFoundError, ConnectionRefusedError):
+            return False
+    return True
+
+
+class Daemon:
+    """Long-running server for encoding and decoding requests.
+
+    Requests arrive through a Unix domain socket and are processed by a pool
+    of worker processes started in advance, so each request avoids the
+    interpreter startup and imports. Clients can send several requests
+    without waiting for the responses, which are sent back as soon as each
+    one is ready and carry the identifier of their request.
+
+    Requests have an "op" ("encode", "decode" or "stats"), an "id" and a
+    "password" in their header, and the text or image in their payload.
+    Responses report whether the request succeeded, its latency and the
+    amount of requests being processed when it finished.
+
+    This class requires the following parameters:
+        Socket path, where the daemon listens
+        Workers, the amount of worker processes
+
+    >>> import os, subprocess, sys, tempfile, time
+    >>> from src.client import DaemonClient
+    >>> path = os.path.join(tempfile.mkdtemp(), "t2i.sock")
+    >>> daemon = subprocess.Popen(
+    ...     [sys.executable, "-m", "src.daemon", path, "1"])
+    >>> while daemon.poll() is None and not is_listening(path):
+    ...     time.sleep(0.05)
+    >>> with DaemonClient(path) as client:
+    ...     image = client.request("encode", b"hfb3", b"Hello")[1]
+    ...     client.request("decode", b"hfb3", image)[1]
+    b'Hello'
+    >>> asyncio.run(Daemon(path).serve())
+    Traceback (most recent call last):
+    ...
+    src.daemon.SocketInUseError: A daemon already listens on ...
+    >>> daemon.terminate()
+    >>> daemon.wait(), os.path.exists(path)
+    (0, False)
+    """
+
+    def __init__(self, socket_path: str = protocol.default_socket_path,
+                 max_workers: Optional[int] = None):
+        self.socket_path = socket_path
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.executor = None
+        self.in_flight = 0
+        self.completed = 0
+        self.failed = 0
+        self.total_latency = 0.0
+
+    def stats(self) -> dict:
+        """Summarize the requests served so far.
+
+        :return: The amount of requests in progress, completed and failed,
+        and the mean latency of the completed ones in seconds.
+        """
+        served = self.completed + self.failed
+        return {
+            "in_flight": self.in_flight,
+            "completed": self.completed,
+            "failed": self.failed,
+            "mean_latency": self.total_latency / served if served else 0.0,
+            "workers": self.max_workers,
+        }
+
+    async def _serve_request(self, header: dict, payload: bytes,
+                             writer: asyncio.StreamWriter,
+                             write_lock: asyncio.Lock) -> None:
+        start = perf_counter()
+        response = {"id": header.get("id")}
+        result = bytes()
+        self.in_flight += 1
+        try:
+            if header.get("op") == "stats":
+                response.update(self.stats())
+            else:
+                operation = operations[header.get("op")]
+                password = bytes(header["password"], "ascii")
+                result = await asyncio.get_running_loop().run_in_executor(
+                    self.executor, operation, payload, password)
+            response["ok"] = True
+            self.completed += 1
+        except Exception as e:
+            response["ok"] = False
+            response["error"] = f"{type(e).__name__}: {e}"
+            self.failed += 1
+        finally:
+            self.in_flight -= 1
+
+        latency = perf_counter() - start
+        self.total_latency += latency
+        response["latency"] = latency
+        response["queue_depth"] = self.in_flight
+        async with write_lock:
+            writer.write(protocol.pack_message(response, result))
+            await writer.drain()
+
+    async def _handle_connection(self, reader: asyncio.StreamReader,
+                                 writer: asyncio.StreamWriter) -> None:
+        write_lock = asyncio.Lock()
+        requests = set()
+        try:
+            while True:
+                try:
+                    header, payload = await protocol.read_message_async(
+                        reader)
+                except asyncio.IncompleteReadError:
+                    break
+                # Keep reading while the request is processed
+                request = asyncio.create_task(self._serve_request(
+                    header, payload, writer, write_lock))
+                requests.add(request)
+                request.add_done_callback(requests.discard)
+            if requests:
+                await asyncio.gather(*requests)
+        finally:
+            writer.close()
+
+    async def serve(self) -> None:
+        """Start the worker pool and serve requests until interrupted.
+
+        A socket left behind by a daemon that did not stop cleanly is
+        replaced, but the daemon refuses to start if another process still
+        listens on it, or if the path holds a file that is not a socket.
+        """
+        if os.path.lexists(self.socket_path):
+            if is_listening(self.socket_path):
+                raise SocketInUseError(
+                    f"A daemon already listens on {self.socket_path}")
+            if not stat.S_ISSOCK(os.lstat(self.socket_path).st_mode):
+                raise SocketInUseError(
+                    f"{self.socket_path} exists and is not a socket")
+            os.unlink(self.socket_path)
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.max_workers, initializer=_warm_up)
+        loop = asyncio.get_running_loop()
+        # Start every worker before accepting requests
+        await asyncio.gather(*[
+            loop.run_in_executor(self.executor, _warm_up)
+            for _ in range(self.max_workers)])
+
+        stop = asyncio.Event()
+        for signal_number in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signal_number, stop.set)
+
+        server = await asyncio.start_unix_server(
+            self._handle_connection, path=self.socket_path)
+        try:
+            async with server:
+                await stop.wait()
+        finally:
+            self.executor.shutdown(cancel_futures=True)
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+
+
+def print_help(exec_name: str) -> None:
+    """Display help in console."""
+    print(f"""
+    Text to image encryption algorithm - Daemon
+
+         Usage: python3 {exec_name} [socket path] [workers]
+
+    Keeps a pool of worker processes ready to encode and decode, serving
+    requests through a Unix domain socket. Use src/client.py to send them.
+    The socket path defaults to the T2I_SOCKET environment variable, or
+    "{protocol.default_socket_path}".
+    """)
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) > 1 and sys.argv[1] in ("-h", "--help"):
+        print_help(sys.argv[0])
+    else:
+        daemon = Daemon(
+            sys.argv[1] if len(sys.argv) > 1 else protocol.default_socket_path,
+            int(sys.argv[2]) if len(sys.argv) > 2 else None)
+        try:
+            asyncio.run(daemon.serve())
+        except SocketInUseError as error:
+            sys.exit(str(error))
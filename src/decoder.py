@@ -1,6 +1,11 @@
-from PIL import Image
+from typing import BinaryIO, Iterable, Iterator, Optional, Union
+import io
+import itertools
 from src import algorithms as algo
-from src.utilities import image_conversions
+from src.cipher import get_cipher
+from src.utilities import container, image_formats, metrics, result_cache
+
+_STRIP_MSB = bytes([byte & 127 for byte in range(256)])
 
 
 def decode_text(text: bytes, algorithm_index: int,
@@ -14,34 +19,234 @@ def decode_text(text: bytes, algorithm_index: int,
     """
     algorithm_id = chr(algorithm_list[algorithm_index])
     algorithm_object = algo.algo_dict.get(algorithm_id, algo.algo_dict.get('a'))
-    return algorithm_object.decode(
-        text, algorithms=algorithm_list, index=algorithm_index)
+    return metrics.timed(
+        "layer", algorithm_object.decode, text, algorithm_id=algorithm_id,
+        algorithms=algorithm_list, index=algorithm_index)
+
 
+def strip_msb(data: bytes) -> bytes:
+    """Ignore the randomized MSB in every byte of the image data.
+
+    :param data: The image data.
+    :return: The encoded text, using 7 bits per byte.
+    """
+    return bytes(data).translate(_STRIP_MSB)
 
-def decode_file(image_file: str, algorithm_list: bytes) -> bytes:
+
+def iter_decode_file(image_file: Union[str, BinaryIO], algorithm_list: bytes,
+                     chunk_size: int = container.default_frame_size
+                     ) -> Iterator[bytes]:
+    """Read the contents of an image file and decode the contents through a
+    series of string-modifying algorithms, one piece at a time.
+
+    Images encoded with the container format are decoded one frame at a
+    time. PNG images are also read as the frames are decoded, so only a
+    chunk of the image and a frame are held in memory, see
+    image_formats.iter_image_data. Otherwise, the whole text is decoded at
+    once.
+
+    :param image_file: The file to read contents from, as a name or a file
+    opened in binary mode, such as the standard input.
+    :param algorithm_list: A list of algorithm identifiers.
+    :param chunk_size: The amount of image bytes processed at once.
+    :return: A generator of decoded pieces of text.
+    """
+    chunks = image_formats.iter_image_data(image_file, chunk_size)
+    return iter_decode_chunks(chunks, algorithm_list)
+
+
+def iter_decode_data(rand_msb_data: bytes, algorithm_list: bytes,
+                     chunk_size: int = container.default_frame_size
+                     ) -> Iterator[bytes]:
+    """Decode the data recovered from an image through a series of
+    string-modifying algorithms, one piece at a time.
+
+    See iter_decode_file.
+
+    Containers holding a password check are verified right away, so a
+    wrong password raises container.PasswordError before decoding anything.
+    Dense containers keep every bit of the data, instead of ignoring the
+    randomized MSB.
+
+    :param rand_msb_data: The data stored in the image, with randomized MSB.
+    :param algorithm_list: A list of algorithm identifiers.
+    :param chunk_size: The amount of image bytes processed at once.
+    :return: A generator of decoded pieces of text.
+
+    >>> from src import encoder
+    >>> data = bytes(encoder.randomize_msb(b"".join(container.encode_frames(
+    ...     [bytes("Hello", "ascii")], get_cipher(b"hfb3")))))
+    >>> iter_decode_data(data, b"hfb4")
+    Traceback (most recent call last):
+    ...
+    src.utilities.container.PasswordError: Wrong password for this image
+    """
+    header = strip_msb(rand_msb_data[:container.max_header_size])
+    if not container.is_container(header):
+        # Run the compiled algorithm list backwards, shared across calls
+        return iter([get_cipher(algorithm_list).decode(
+            metrics.timed("msb", strip_msb, rand_msb_data))])
+
+    chunks = (rand_msb_data[i:i + chunk_size]
+              for i in range(0, len(rand_msb_data), chunk_size))
+    return iter_decode_chunks(chunks, algorithm_list)
+
+
+def iter_decode_chunks(chunks: Iterable[bytes], algorithm_list: bytes
+                       ) -> Iterator[bytes]:
+    """Decode the data recovered from an image as it arrives in chunks.
+
+    See iter_decode_data. The chunks holding the header are read right
+    away, so a wrong password raises container.PasswordError before
+    decoding anything. Images without the container format are joined and
+    decoded at once.
+
+    :param chunks: The data stored in the image, with randomized MSB, in
+    consecutive chunks.
+    :param algorithm_list: A list of algorithm identifiers.
+    :return: A generator of decoded pieces of text.
+
+    >>> from src import encoder
+    >>> data = encoder.encode_data(bytes("Hello world", "ascii"), b"hfb3")
+    >>> b"".join(iter_decode_chunks([data[:3], data[3:]], b"hfb3"))
+    b'Hello world'
+    """
+    chunks = iter(chunks)
+    start = bytearray()
+    for chunk in chunks:
+        start += chunk
+        if len(start) >= container.max_header_size:
+            break
+    header = strip_msb(start[:container.max_header_size])
+    if not container.is_container(header):
+        for chunk in chunks:
+            start += chunk
+        return iter_decode_data(start, algorithm_list)
+
+    dense = container.is_dense(header)
+    cipher = get_cipher(algorithm_list, 8 if dense else 7)
+    container.read_header(header, cipher)
+    chunks = itertools.chain([start], chunks)
+    if not dense:
+        chunks = (metrics.timed("msb", strip_msb, chunk) for chunk in chunks)
+    return container.decode_frames(chunks, cipher)
+
+
+def decode_file(image_file: Union[str, BinaryIO], algorithm_list: bytes,
+                cache: Optional[result_cache.ResultCache] = None) -> bytes:
     """Read the contents of an image file and decode the contents through a
     series of string-modifying algorithms.
 
-    :param image_file: The file to read contents from.
+    :param image_file: The file to read contents from, see
+    iter_decode_file.
     :param algorithm_list: A list of algorithm identifiers.
+    :param cache: The store of decoded texts, addressed by the contents of
+    the image file and the password. Repeated decodes of the same image with
+    the same password are then served from the cache.
     :return: The encoded text, prepended by the list of algorithm identifiers.
     """
-    image = Image.open(image_file, "r")
-    rand_msb_data = image_conversions.image_to_bytes(image)
+    if cache is None:
+        return b"".join(iter_decode_file(image_file, algorithm_list))
+
+    if isinstance(image_file, str):
+        with open(image_file, "rb") as f:
+            image_data = f.read()
+    else:
+        image_data = image_file.read()
+    return decode_image_data(image_data, algorithm_list, cache)
+
+
+def decode_image_data(image_data: bytes, algorithm_list: bytes,
+                      cache: Optional[result_cache.ResultCache] = None
+                      ) -> bytes:
+    """Decode the text stored in the contents of an image file.
+
+    :param image_data: The contents of the image file, in any format
+    written by the encoder.
+    :param algorithm_list: A list of algorithm identifiers.
+    :param cache: The store of decoded texts, see decode_file.
+    :return: The decoded text.
+    """
+    key = None
+    if cache is not None:
+        key = cache.key("decode", image_data, get_cipher(algorithm_list))
+        text = metrics.timed("cache", cache.get, key)
+        if text is not None:
+            return text
+
+    rand_msb_data = image_formats.read_image_data(io.BytesIO(image_data))
+    text = b"".join(iter_decode_data(rand_msb_data, algorithm_list))
+    if cache is not None:
+        cache.put(key, text)
+    return text
+
+
+def decode_range(image_file: Union[str, BinaryIO], algorithm_list: bytes,
+                 start: int, length: int) -> bytes:
+    """Read the contents of an image file and decode a span of its text.
+
+    Only the bytes holding the span are decoded when the algorithm list
+    allows it, see Plan.decode_range. Like slicing, spans past the end of the
+    text are shortened.
+
+    :param image_file: The file to read contents from, see
+    iter_decode_file.
+    :param algorithm_list: A list of algorithm identifiers.
+    :param start: The position of the first decoded byte of the text.
+    :param length: The amount of bytes to decode.
+    :return: The decoded span of the text.
+    """
+    rand_msb_data = image_formats.read_image_data(image_file)
+    return decode_data_range(rand_msb_data, algorithm_list, start, length)
+
 
-    # Ignore randomized MSB in every byte
-    encoded_data = bytes("", "ascii")
-    for byte in rand_msb_data:
-        encoded_data += bytes(chr(byte & 127), "ascii")
+def decode_data_range(rand_msb_data: bytes, algorithm_list: bytes,
+                      start: int, length: int) -> bytes:
+    """Decode a span of the text stored in the data recovered from an image.
 
-    # Run the algorithm list backwards
-    decoded_text = decode_text(
-        encoded_data, len(algorithm_list) - 1, algorithm_list)
+    See decode_range.
 
-    for i in range(len(algorithm_list) - 1, 0, -1):
-        decoded_text = decode_text(decoded_text, i - 1, algorithm_list)
+    :param rand_msb_data: The data stored in the image, with randomized MSB.
+    :param algorithm_list: A list of algorithm identifiers.
+    :param start: The position of the first decoded byte of the text.
+    :param length: The amount of bytes to decode.
+    :return: The decoded span of the text.
+
+    >>> from src import encoder
+    >>> data = encoder.encode_data(bytes("Hello world", "ascii"), b"hb3e")
+    >>> decode_data_range(data, b"hb3e", 6, 100)
+    b'world'
+    """
+    header = strip_msb(rand_msb_data[:container.max_header_size])
+    if container.is_dense(header):
+        return container.decode_range(
+            rand_msb_data, get_cipher(algorithm_list, 8), start, length)
 
-    return decoded_text
+    cipher = get_cipher(algorithm_list)
+    data = metrics.timed("msb", strip_msb, rand_msb_data)
+    if container.is_container(data):
+        return container.decode_range(data, cipher, start, length)
+    return cipher.decode_range(data, start, length)
+
+
+def write_text(pieces: Iterable[bytes], f: BinaryIO) -> int:
+    """Write decoded pieces of text to a file as soon as each one is ready.
+
+    The pieces are written from their own buffers, without converting them
+    into strings, so the file receives the exact bytes of the original text.
+
+    :param pieces: The decoded pieces of text.
+    :param f: The file to write to, opened in binary mode.
+    :return: The amount of bytes written.
+
+    >>> import io
+    >>> write_text([bytes("ab", "ascii"), bytes("c", "ascii")], io.BytesIO())
+    3
+    """
+    written = 0
+    for decoded_data in pieces:
+        written += metrics.timed("write", f.write, memoryview(decoded_data))
+    return written
 
 
 def print_help(exec_name: str) -> None:
@@ -49,12 +254,23 @@ def print_help(exec_name: str) -> None:
     print(f"""
     Text to image encryption algorithm - Decoding
          
-         Usage: python3 {exec_name} <file name> <password>
+         Usage: python3 {exec_name} <file name> <password> [start] [length]
 
     The file to decode is expected to be an RGB image stored in PNG format
-    (Portable Network Graphics).
+    (Portable Network Graphics), or any other format written by the encoder
+    (BMP, TIFF or PPM), which is detected from the contents of the file.
+    Use "-" as the file name to read the image from the standard input and
+    write the text to the standard output, one frame at a time.
     The password should match the one used in the encoding process. Please
     see the encoding script for a small tip on selecting the password. 
+    Images encoded in frames store a check of the password, and a wrong
+    password is reported without decoding the image.
+    Set the start and length to only decode that span of the text.
+    Set the T2I_METRICS environment variable to "log" and/or "prometheus"
+    to display the time spent in each stage.
+    Set the T2I_CACHE environment variable to a directory to keep the
+    decoded texts there, so decoding the same image again with the same
+    password only reads the stored text. The texts are stored unencrypted.
     """)
 
 
@@ -64,11 +280,36 @@ if __name__ == "__main__":
     if len(sys.argv) < 3:
         print_help(sys.argv[0])
     else:
+        prometheus = metrics.enable_from_environment()
+        cache = result_cache.from_environment()
         file_name = sys.argv[1]
-        # Decode file contents
-        decoded_data = decode_file(file_name, bytes(sys.argv[2], "ascii"))
+        # Decode the standard input into the standard output
+        image_file = sys.stdin.buffer if file_name == "-" else file_name
+        algorithm_list = bytes(sys.argv[2], "ascii")
+        try:
+            if len(sys.argv) > 3:
+                # Decode only the requested span of the text
+                start = int(sys.argv[3])
+                length = int(sys.argv[4]) if len(sys.argv) > 4 else sys.maxsize
+                pieces = [decode_range(
+                    image_file, algorithm_list, start, length)]
+            elif cache is not None:
+                pieces = [decode_file(image_file, algorithm_list, cache)]
+            else:
+                # Decode file contents, writing each piece as soon as it is
+                # ready
+                pieces = iter_decode_file(image_file, algorithm_list)
+        except container.PasswordError as error:
+            # Nothing was decoded, and the output file is left untouched
+            sys.exit(f"{file_name}: {error}")
+        if file_name == "-":
+            write_text(pieces, sys.stdout.buffer)
+            sys.stdout.buffer.flush()
+        else:
+            # Get input file path and name without the file extension
+            file_id = ''.join(file_name.split(".")[:-1])
+            with open(f"{file_id}.txt", "wb") as f:
+                write_text(pieces, f)
 
-        # Get input file path and name without the file extension
-        file_id = ''.join(file_name.split(".")[:-1])
-        with open(f"{file_id}.txt", "w") as f:
-            f.write(decoded_data.decode("ascii"))
+        if prometheus is not None:
+            sys.stderr.write(prometheus.render())
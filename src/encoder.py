@@ -1,6 +1,19 @@
+from contextlib import contextmanager
+from typing import BinaryIO, Iterable, Iterator, Optional, Union
 from src import algorithms as algo
-from src.utilities import image_conversions
-from random import randrange
+from src.cipher import get_cipher
+from src.utilities import bytes_conversions, container, image_formats
+from src.utilities import metrics
+from src.utilities import compression as compressions
+from src.utilities.compression import Compression
+from src.utilities.file_io import atomic_write
+import mmap
+import os
+import random
+import re
+
+# Byte values that do not fit in 7 bits
+_eight_bit_value = re.compile(b"[\x80-\xff]")
 
 
 def encode_text(text: bytes, algorithm_index: int,
@@ -14,32 +27,316 @@ def encode_text(text: bytes, algorithm_index: int,
     """
     algorithm_id = chr(algorithm_list[algorithm_index])
     algorithm_object = algo.algo_dict.get(algorithm_id, algo.algo_dict.get('a'))
-    return algorithm_object.encode(
-        text, algorithms=algorithm_list, index=algorithm_index)
+    return metrics.timed(
+        "layer", algorithm_object.encode, text, algorithm_id=algorithm_id,
+        algorithms=algorithm_list, index=algorithm_index)
+
+
+@contextmanager
+def map_file(text_file: str) -> Iterator[memoryview]:
+    """Map the contents of a file into memory instead of reading them.
+
+    The operating system loads the pages of the file as they are accessed,
+    so the contents are never copied into a bytes object. The view must not
+    be used, nor any view taken from it, once the context is left.
+
+    :param text_file: The file to map.
+    :return: A read-only view of the contents of the file.
+    """
+    with open(text_file, "rb") as f:
+        # Empty files cannot be mapped
+        if not os.fstat(f.fileno()).st_size:
+            yield memoryview(bytes())
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            with memoryview(mapped) as view:
+                yield view
+
+
+def check_seven_bits(text: bytes) -> bytes:
+    """Ensure a text only holds 7-bit values, such as ASCII text.
 
+    The encoder replaces the MSB of every byte with a random value, so any
+    byte above 127 would be corrupted. Binary files must be encoded in dense
+    mode, with 8 bits per byte, instead.
+
+    :param text: The text to encode, as a bytes object or a view of it.
+    :return: The same text.
+
+    >>> check_seven_bits(bytes("hello", "ascii"))
+    b'hello'
+    >>> check_seven_bits(bytes("héllo", "utf-8"))  # doctest: +ELLIPSIS
+    Traceback (most recent call last):
+    ...
+    ValueError: Byte 195 at position 1 does not fit in 7 bits, ...
+    """
+    # Views, such as a mapped file, are searched without copying them
+    match = _eight_bit_value.search(text)
+    if match:
+        raise ValueError(f"Byte {text[match.start()]} at position "
+                         f"{match.start()} does not fit in 7 bits, encode "
+                         f"binary or non-ASCII files with 8 bits (dense mode)")
+    return text
+
+
+def randomize_msb(text: bytes,
+                  rng: Optional[random.Random] = None) -> bytearray:
+    """Set a random value on the MSB of every byte of the encoded text.
+
+    :param text: The encoded text, using 7 bits per byte.
+    :param rng: The random generator for the MSB values. Defaults to the
+    random source of the operating system.
+    :return: The encoded text with a random MSB on each byte.
+    """
+    random_bytes = rng.randbytes(len(text)) if rng else os.urandom(len(text))
+    # Randomize MSB on all bytes (Ascii -> UTF8 extra bit)
+    return bytearray(bytes_conversions.merge_msb(text, random_bytes))
 
-def encode_file(text_file: str, algorithm_list: bytes) -> bytearray:
+
+_no_compression = compressions.codecs["none"]
+
+
+def encode_pieces(frames: Iterable[bytes], algorithm_list: bytes,
+                  frame_size: int = container.default_frame_size,
+                  bits: int = 7, rng: Optional[random.Random] = None,
+                  compression: Compression = _no_compression
+                  ) -> Iterator[bytes]:
+    """Encode a sequence of frames into the pieces of a container.
+
+    :param frames: The frames to encode, no longer than the frame size.
+    :param algorithm_list: A list of algorithm identifiers.
+    :param frame_size: The maximum amount of bytes encoded at once.
+    :param bits: The amount of bits of each byte of the text. With 7 bits,
+    frames holding bytes above 127 raise ValueError, see check_seven_bits.
+    Dense containers, using 8 bits, store binary data as it is and have no
+    randomized MSB.
+    :param rng: The random generator for the MSB values and the salt.
+    :param compression: The codec compressing each frame before the
+    layers. Compressed data uses every bit, so the container is dense.
+    :return: A generator of container pieces.
+    """
+    if compression.identifier:
+        bits = 8
+    if bits == 7:
+        frames = map(check_seven_bits, frames)
+    cipher = get_cipher(algorithm_list, bits)
+    pieces = container.encode_frames(
+        frames, cipher, frame_size, rng, compression)
+    try:
+        for piece in pieces:
+            if bits == 8:
+                yield piece
+            else:
+                yield metrics.timed("msb", randomize_msb, piece, rng=rng)
+    finally:
+        # Drop the frames still referencing their buffer, such as a mapped
+        # file
+        pieces.close()
+
+
+def iter_encode_file(text_file: str, algorithm_list: bytes,
+                     frame_size: int = container.default_frame_size,
+                     bits: int = 7,
+                     compression: Compression = _no_compression
+                     ) -> Iterator[bytes]:
+    """Read the contents of a text file in frames and encode each of them
+    through a series of string-modifying algorithms.
+
+    The file is read, encoded and returned one frame at a time, in the
+    container format, so memory usage depends on the frame size instead of
+    the file size.
+
+    :param text_file: The file to read contents from.
+    :param algorithm_list: A list of algorithm identifiers.
+    :param frame_size: The maximum amount of bytes encoded at once.
+    :param bits: The amount of bits of each byte of the text, 8 for binary
+    files. See encode_pieces.
+    :param compression: The codec compressing each frame, see
+    encode_pieces.
+    :return: A generator of container pieces, with randomized MSB unless
+    the container is dense.
+    """
+    with map_file(text_file) as raw_text:
+        if bits == 7 and not compression.identifier:
+            # Checked at once, as an error raised while encoding a frame
+            # would keep its view of the file, which could not be unmapped
+            check_seven_bits(raw_text)
+        # Each frame is copied out of the mapped file, which reads it
+        pieces = encode_pieces(
+            (metrics.timed("read", bytes, frame)
+             for frame in container.split_frames(raw_text, frame_size)),
+            algorithm_list, frame_size, bits, compression=compression)
+        try:
+            yield from pieces
+        finally:
+            # Drop the frames before unmapping the file
+            pieces.close()
+
+
+def encode_file(text_file: str, algorithm_list: bytes,
+                frame_size: Optional[int] = None, bits: int = 7,
+                compression: Compression = _no_compression) -> bytearray:
     """Read the contents of a text file and encode the contents through a
     series of string-modifying algorithms.
 
     :param text_file: The file to read contents from.
     :param algorithm_list: A list of algorithm identifiers.
+    :param frame_size: If set, encode the file in frames of this size using
+    the container format. See iter_encode_file.
+    :param bits: The amount of bits of each byte of the text, 8 for binary
+    files. Dense files always use the container format.
+    :param compression: The codec compressing the text before the layers.
+    Compressed files always use a dense container.
     :return: The encoded text, prepended by the list of algorithm identifiers.
+    The whole encoded text is held in memory, see encode_file_to_image to
+    write the frames into an image as they are encoded.
     """
-    with open(text_file, "rb") as f:
-        raw_text = f.read()
+    if frame_size or bits == 8 or compression.identifier:
+        return bytearray().join(iter_encode_file(
+            text_file, algorithm_list,
+            frame_size or container.default_frame_size, bits, compression))
 
-    encoded_text = encode_text(raw_text, 0, algorithm_list)
-    for i in range(1, len(algorithm_list)):
-        encoded_text = encode_text(encoded_text, i, algorithm_list)
+    with map_file(text_file) as raw_text:
+        return encode_data(raw_text, algorithm_list)
 
-    # Randomize MSB on all bytes (Ascii -> UTF8 extra bit)
-    rand_msb_text = bytearray()
-    for byte in encoded_text:
-        # print(byte)
-        rand_msb_text.append(randrange(0, 2) * 128 + byte)
 
-    return rand_msb_text
+def encode_file_to_image(text_file: str, algorithm_list: bytes,
+                         image_file: Union[str, BinaryIO],
+                         image_format: image_formats.ImageFormat =
+                         image_formats.formats[image_formats.default_format],
+                         frame_size: Optional[int] = None, bits: int = 7,
+                         compression: Compression = _no_compression) -> None:
+    """Encode a text file and store the result as an image.
+
+    With a frame size, or in dense mode, and without compression, the size
+    of the container follows from the size of the file, so each frame is
+    written into the image as soon as it is encoded, see
+    image_formats.write_image_pieces. Only a frame and a scanline of a PNG
+    image are then held in memory. Otherwise, the encoded text is held in
+    memory before writing the image, see encode_file. Image files given by
+    name only appear once complete.
+
+    :param text_file: The file to read contents from.
+    :param algorithm_list: A list of algorithm identifiers.
+    :param image_file: The file name, or a file opened in binary mode.
+    :param image_format: The format of the image, see image_formats.
+    :param frame_size: If set, encode the file in frames of this size, see
+    encode_file.
+    :param bits: The amount of bits of each byte of the text, see
+    encode_file.
+    :param compression: The codec compressing the text, see encode_file.
+    """
+    if isinstance(image_file, str):
+        with atomic_write(image_file, "wb") as f:
+            encode_file_to_image(text_file, algorithm_list, f, image_format,
+                                 frame_size, bits, compression)
+        return
+
+    if compression.identifier or not (frame_size or bits == 8):
+        encoded_data = encode_file(text_file, algorithm_list, frame_size,
+                                   bits, compression)
+        image_formats.write_image_data(encoded_data, image_file, image_format)
+        return
+
+    frame_size = frame_size or container.default_frame_size
+    data_length = container.get_container_length(
+        os.path.getsize(text_file), frame_size)
+    image_formats.write_image_pieces(
+        iter_encode_file(text_file, algorithm_list, frame_size, bits),
+        data_length, image_file, image_format)
+
+
+def iter_encode_stream(stream: BinaryIO, algorithm_list: bytes,
+                       frame_size: int = container.default_frame_size,
+                       bits: int = 7,
+                       compression: Compression = _no_compression
+                       ) -> Iterator[bytes]:
+    """Read a text from a stream in frames and encode each of them as soon
+    as it arrives.
+
+    Works like iter_encode_file for streams that cannot be mapped into
+    memory, such as the standard input of a pipeline.
+
+    :param stream: The stream to read the text from, until its end.
+    :param algorithm_list: A list of algorithm identifiers.
+    :param frame_size: The maximum amount of bytes encoded at once.
+    :param bits: The amount of bits of each byte of the text, see
+    encode_pieces.
+    :param compression: The codec compressing each frame, see
+    encode_pieces.
+    :return: A generator of container pieces, with randomized MSB unless
+    the container is dense.
+
+    >>> import io
+    >>> from src import decoder
+    >>> data = bytearray().join(iter_encode_stream(
+    ...     io.BytesIO(b"Hello world"), b"hfb3", 4))
+    >>> b"".join(decoder.iter_decode_data(data, b"hfb3"))
+    b'Hello world'
+    """
+    return encode_pieces(container.read_frames(stream, frame_size),
+                         algorithm_list, frame_size, bits,
+                         compression=compression)
+
+
+def encode_stream(stream: BinaryIO, algorithm_list: bytes,
+                  frame_size: Optional[int] = None, bits: int = 7,
+                  compression: Compression = _no_compression) -> bytearray:
+    """Read a text from a stream and encode it through a series of
+    string-modifying algorithms.
+
+    See encode_file. Without a frame size, the whole text is read before
+    encoding it.
+
+    :param stream: The stream to read the text from, until its end.
+    :param algorithm_list: A list of algorithm identifiers.
+    :param frame_size: If set, encode the text in frames of this size as
+    they arrive. See iter_encode_stream.
+    :param bits: The amount of bits of each byte of the text, see
+    encode_file.
+    :param compression: The codec compressing the text, see encode_file.
+    :return: The encoded text.
+    """
+    if frame_size or bits == 8 or compression.identifier:
+        return bytearray().join(iter_encode_stream(
+            stream, algorithm_list,
+            frame_size or container.default_frame_size, bits, compression))
+
+    return encode_data(stream.read(), algorithm_list)
+
+
+def encode_data(raw_text: bytes, algorithm_list: bytes,
+                rng: Optional[random.Random] = None, bits: int = 7,
+                compression: Compression = _no_compression) -> bytearray:
+    """Encode a text through a series of string-modifying algorithms.
+
+    :param raw_text: The text to encode, as a bytes object or a view of it.
+    :param algorithm_list: A list of algorithm identifiers.
+    :param rng: The random generator for the MSB values, see randomize_msb.
+    :param bits: The amount of bits of each byte of the text. With 7 bits,
+    texts holding bytes above 127 raise ValueError, see check_seven_bits.
+    With 8 bits, the text is stored in a single frame of a dense container.
+    :param compression: The codec compressing the text before the layers.
+    Compressed texts are always stored in a dense container.
+    :return: The encoded text, with randomized MSB unless it is dense.
+
+    >>> from src import decoder
+    >>> data = encode_data(bytes([0, 200, 255]), b"hfb3", bits=8)
+    >>> b"".join(decoder.iter_decode_data(data, b"hfb3"))
+    b'\\x00\\xc8\\xff'
+    """
+    if bits == 8 or compression.identifier:
+        frame_size = container.default_frame_size
+        return bytearray().join(encode_pieces(
+            container.split_frames(memoryview(raw_text), frame_size),
+            algorithm_list, frame_size, bits, rng, compression))
+
+    # Run the compiled algorithm list, shared across calls, over a single
+    # working copy of the text
+    buffer = check_seven_bits(metrics.timed("read", bytearray, raw_text))
+    get_cipher(algorithm_list).encode_into(buffer)
+
+    return metrics.timed("msb", randomize_msb, buffer, rng=rng)
 
 
 def print_help(exec_name: str) -> None:
@@ -47,13 +344,38 @@ def print_help(exec_name: str) -> None:
     print(f"""
     Text to image encryption algorithm - Encoding
          
-         Usage: python3 {exec_name} <file name> <password>
+         Usage: python3 {exec_name} <file name> <password> [frame size]
+                        [format] [bits] [compression]
 
     The file to encode is expected to be in plain-text, and it should have
     a file extension (.txt, .md, ...) to prevent read/write errors.
+    Use "-" as the file name to read the text from the standard input and
+    write the image to the standard output. With a frame size, each frame
+    is encoded as soon as it is read, but the image is only written at the
+    end of the input.
     The password can be manually built from the list indicated in the file
     "Text-To-ImageEncryption/Algorithm_list.txt" or input blindly, but you
     should write it down for the decoding process.
+    If a frame size is given, the file is encoded in frames of that many
+    bytes, and a check of the password is stored so the decoder rejects
+    wrong passwords right away. Without compression, the frames of a file
+    are written into a PNG image as they are encoded, which keeps memory
+    usage bounded for large files. Use a frame size of 0 to encode the
+    whole file at once.
+    The image is stored as PNG by default. The format can be "png", "bmp",
+    "tiff" or "ppm", and PNG accepts a compression level from 0 to 9, as in
+    "png:1". The encoded data barely compresses, so uncompressed formats
+    and low levels are much faster to write, and the decoder reads any of
+    them.
+    Texts are stored using 7 bits per byte. Set the bits to 8 to encode any
+    binary file as it is. This is meant for binary files only, as texts
+    produce images of the same size or slightly larger.
+    The text can be compressed before encoding with "zlib", "lzma" or "bz2",
+    optionally followed by a level, as in "lzma:9", which reduces the size
+    of the image and the time to write it. Compressed images are always
+    stored with 8 bits per byte, and decompressed automatically.
+    Set the T2I_METRICS environment variable to "log" and/or "prometheus"
+    to display the time spent in each stage.
     """)
 
 
@@ -63,13 +385,33 @@ if __name__ == "__main__":
     if len(sys.argv) < 3:
         print_help(sys.argv[0])
     else:
+        prometheus = metrics.enable_from_environment()
         file_name = sys.argv[1]
-        # Encode file contents
-        encoded_data = encode_file(file_name, bytes(sys.argv[2], "ascii"))
-        # Manipulate encoded data into an RGB image
-        image = image_conversions.bytes_to_image(encoded_data)
-
-        # Get input file path and name without the file extension
-        file_id = ''.join(file_name.split(".")[:-1])
-        # Store output image as PNG
-        image.save(f"{file_id}.png", "PNG")
+        frame_size = int(sys.argv[3]) if len(sys.argv) > 3 else None
+        output_format = image_formats.get_format(
+            sys.argv[4] if len(sys.argv) > 4 else image_formats.default_format)
+        bits = int(sys.argv[5]) if len(sys.argv) > 5 else 7
+        if bits not in (7, 8):
+            raise ValueError("Bits per byte must be 7 or 8")
+        text_compression = compressions.get_compression(
+            sys.argv[6] if len(sys.argv) > 6 else "none")
+        algorithm_list = bytes(sys.argv[2], "ascii")
+        if file_name == "-":
+            # Encode the standard input into the standard output
+            encoded_data = encode_stream(sys.stdin.buffer, algorithm_list,
+                                         frame_size, bits, text_compression)
+            # Store encoded data as an RGB image in the selected format
+            image_formats.write_image_data(
+                encoded_data, sys.stdout.buffer, output_format)
+            sys.stdout.buffer.flush()
+        else:
+            # Get input file path and name without the file extension
+            file_id = ''.join(file_name.split(".")[:-1])
+            # Encode file contents into an image in the selected format
+            encode_file_to_image(
+                file_name, algorithm_list,
+                f"{file_id}.{output_format.extension}", output_format,
+                frame_size, bits, text_compression)
+
+        if prometheus is not None:
+            sys.stderr.write(prometheus.render())
@@ -0,0 +1,323 @@
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from functools import partial
+from typing import Optional
+import asyncio
+import io
+import random
+from src import decoder, encoder
+from src.cipher import get_cipher
+from src.utilities import compression, image_formats
+from src.utilities.compression import Compression
+from src.utilities.result_cache import ResultCache
+
+_default_format = image_formats.formats[image_formats.default_format]
+_no_compression = compression.codecs["none"]
+
+
+def encode_image(raw_text: bytes, algorithm_list: bytes,
+                 image_format: image_formats.ImageFormat = _default_format,
+                 rng: Optional[random.Random] = None, bits: int = 7,
+                 text_compression: Compression = _no_compression,
+                 seed: Optional[int] = None,
+                 cache: Optional[ResultCache] = None) -> bytes:
+    """Encode a text into an image file, in memory.
+
+    :param raw_text: The text to encode.
+    :param algorithm_list: A list of algorithm identifiers.
+    :param image_format: The format of the image file, PNG by default.
+    :param rng: The random generator for the MSB values and the padding.
+    Defaults to a new generator for each call.
+    :param bits: The amount of bits of each byte of the text, 8 to encode
+    binary data. See encoder.encode_data.
+    :param text_compression: The codec compressing the text before the
+    layers, see encoder.encode_data.
+    :param seed: The seed of the random generator, instead of rng. The same
+    text, password, options and seed always produce the same image.
+    :param cache: The store of encoded images. Images are only stored and
+    looked up when a seed is given.
+    :return: The contents of the image file.
+
+    >>> image_data = encode_image(b"Hello", b"hfb3", seed=1)
+    >>> image_data == encode_image(b"Hello", b"hfb3", seed=1)
+    True
+    """
+    if seed is not None:
+        rng = random.Random(seed)
+    key = None
+    if cache is not None and seed is not None:
+        key = cache.key("encode", raw_text, get_cipher(algorithm_list, bits),
+                        image_format, text_compression, seed)
+        image_data = cache.get(key)
+        if image_data is not None:
+            return image_data
+
+    encoded_data = encoder.encode_data(
+        raw_text, algorithm_list, rng, bits, text_compression)
+    output = io.BytesIO()
+    image_formats.write_image_data(encoded_data, output, image_format, rng)
+    if key is not None:
+        cache.put(key, output.getvalue())
+    return output.getvalue()
+
+
+def decode_image(image_data: bytes, algorithm_list: bytes,
+                 cache: Optional[ResultCache] = None) -> bytes:
+    """Decode the text stored in an image file, in memory.
+
+    :param image_data: The contents of the image file, in any format
+    written by the encoder.
+    :param algorithm_list: A list of algorithm identifiers.
+    :param cache: The store of decoded texts, see decoder.decode_file.
+    :return: The decoded text.
+    """
+    return decoder.decode_image_data(image_data, algorithm_list, cache)
+
+
+class ThreadedEngine:
+    """Pool of threads encoding and decoding texts within a single process.
+
+    Meant for applications embedding the encoder, such as web services, that
+    receive many requests at once. Any amount of threads may encode and
+    decode at the same time, with the same or different passwords:
+
+        - Algorithms keep no state between calls, and StreamSeed uses its
+          own random generator instead of the one of the random module.
+        - The MSB values and the padding of each image come from a random
+          generator owned by the call.
+        - Ciphers shared through cipher.get_cipher guard their stored
+          keystreams with a lock.
+
+    Python code only runs on one thread at a time, but zlib and PIL release
+    the interpreter lock while compressing and writing images, so the image
+    writing of one request overlaps with the layers of another. For work
+    bound by the layers, use the process pool of src/batch.py or
+    src/daemon.py instead.
+
+    Results are served from the cache, if any, see encode_image and
+    decode_image.
+
+    This class requires the following parameters:
+        Workers, the amount of threads
+    And optionally:
+        Cache, the store of encoded images and decoded texts
+
+    >>> with ThreadedEngine(2) as engine:
+    ...     image_data = engine.encode(b"Hello", b"hfb3").result()
+    ...     engine.decode(image_data, b"hfb3").result()
+    b'Hello'
+    """
+
+    def __init__(self, max_workers: Optional[int] = None,
+                 cache: Optional[ResultCache] = None):
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="t2i")
+        self.cache = cache
+
+    def encode(self, raw_text: bytes, algorithm_list: bytes,
+               image_format: image_formats.ImageFormat = _default_format,
+               bits: int = 7,
+               text_compression: Compression = _no_compression,
+               seed: Optional[int] = None) -> "Future[bytes]":
+        """Encode a text into an image file on a thread of the pool.
+
+        :param raw_text: The text to encode.
+        :param algorithm_list: A list of algorithm identifiers.
+        :param image_format: The format of the image file, PNG by default.
+        :param bits: The amount of bits of each byte of the text, see
+        encode_image.
+        :param text_compression: The codec compressing the text, see
+        encode_image.
+        :param seed: The seed of the random generator, see encode_image.
+        :return: A future receiving the contents of the image file.
+        """
+        return self.executor.submit(
+            encode_image, raw_text, algorithm_list, image_format, None, bits,
+            text_compression, seed, self.cache)
+
+    def decode(self, image_data: bytes,
+               algorithm_list: bytes) -> "Future[bytes]":
+        """Decode the text stored in an image file on a thread of the pool.
+
+        :param image_data: The contents of the image file.
+        :param algorithm_list: A list of algorithm identifiers.
+        :return: A future receiving the decoded text.
+        """
+        return self.executor.submit(
+            decode_image, image_data, algorithm_list, self.cache)
+
+    def close(self, wait: bool = True) -> None:
+        """Stop accepting work and release the threads.
+
+        :param wait: Whether to wait for the pending work to finish.
+        """
+        self.executor.shutdown(wait=wait)
+
+    def __enter__(self) -> "ThreadedEngine":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def _read_file(file_name: str) -> bytes:
+    with open(file_name, "rb") as f:
+        return f.read()
+
+
+def _write_file(file_name: str, data: bytes) -> None:
+    with open(file_name, "wb") as f:
+        f.write(data)
+
+
+class AsyncEngine:
+    """Encoding and decoding for applications running an asyncio event loop.
+
+    The layers and the image conversions run on an executor, so the
+    event loop keeps serving other coroutines meanwhile, and reading and
+    writing files runs on the default executor of the loop. At most
+    max_concurrency requests run at once; later ones wait for a free slot,
+    which keeps the amount of texts and images held in memory bounded.
+    Streams are written through drain(), so slow readers hold back the
+    requests writing to them.
+
+    By default, the engine owns a pool of threads, see ThreadedEngine. A
+    ProcessPoolExecutor runs the layers of several requests in parallel, at
+    the cost of copying the texts and images between processes.
+
+    With a ProcessPoolExecutor, each request only shares the directory of
+    the cache with the others, not the results kept in memory.
+
+    This class requires the following parameters:
+        Executor, running the encoding and decoding, or None to create a
+        pool of threads
+        Concurrency, the maximum amount of requests running at once
+    And optionally:
+        Cache, the store of encoded images and decoded texts
+
+    >>> async def main():
+    ...     async with AsyncEngine(max_concurrency=4) as engine:
+    ...         image_data = await engine.encode(b"Hello", b"hfb3")
+    ...         return await engine.decode(image_data, b"hfb3")
+    >>> asyncio.run(main())
+    b'Hello'
+    """
+
+    def __init__(self, executor: Optional[Executor] = None,
+                 max_concurrency: int = 64,
+                 cache: Optional[ResultCache] = None):
+        self._owns_executor = executor is None
+        self.executor = executor or ThreadPoolExecutor(
+            thread_name_prefix="t2i-async")
+        self.max_concurrency = max_concurrency
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self.cache = cache
+
+    async def _run(self, function, *args):
+        async with self._slots:
+            return await asyncio.get_running_loop().run_in_executor(
+                self.executor, partial(function, *args))
+
+    async def encode(self, raw_text: bytes, algorithm_list: bytes,
+                     image_format: image_formats.ImageFormat = _default_format,
+                     bits: int = 7,
+                     text_compression: Compression = _no_compression,
+                     seed: Optional[int] = None) -> bytes:
+        """Encode a text into an image file, see encode_image.
+
+        :param raw_text: The text to encode.
+        :param algorithm_list: A list of algorithm identifiers.
+        :param image_format: The format of the image file, PNG by default.
+        :param bits: The amount of bits of each byte of the text.
+        :param text_compression: The codec compressing the text.
+        :param seed: The seed of the random generator.
+        :return: The contents of the image file.
+        """
+        return await self._run(encode_image, bytes(raw_text), algorithm_list,
+                               image_format, None, bits, text_compression,
+                               seed, self.cache)
+
+    async def decode(self, image_data: bytes, algorithm_list: bytes) -> bytes:
+        """Decode the text stored in an image file, see decode_image.
+
+        :param image_data: The contents of the image file.
+        :param algorithm_list: A list of algorithm identifiers.
+        :return: The decoded text.
+        """
+        return await self._run(decode_image, bytes(image_data),
+                               algorithm_list, self.cache)
+
+    async def encode_stream(self, reader: asyncio.StreamReader,
+                            writer: asyncio.StreamWriter,
+                            algorithm_list: bytes, **kwargs) -> None:
+        """Encode the text read from a stream, writing the image to another.
+
+        :param reader: The stream providing the text, until its end.
+        :param writer: The stream receiving the image file.
+        :param algorithm_list: A list of algorithm identifiers.
+        :param kwargs: The options of encode.
+        """
+        image_data = await self.encode(
+            await reader.read(), algorithm_list, **kwargs)
+        writer.write(image_data)
+        await writer.drain()
+
+    async def decode_stream(self, reader: asyncio.StreamReader,
+                            writer: asyncio.StreamWriter,
+                            algorithm_list: bytes) -> None:
+        """Decode the image read from a stream, writing the text to another.
+
+        :param reader: The stream providing the image file, until its end.
+        :param writer: The stream receiving the text.
+        :param algorithm_list: A list of algorithm identifiers.
+        """
+        text = await self.decode(await reader.read(), algorithm_list)
+        writer.write(text)
+        await writer.drain()
+
+    async def encode_file(self, text_file: str, image_file: str,
+                          algorithm_list: bytes, **kwargs) -> None:
+        """Encode a text file into an image file.
+
+        :param text_file: The file to read the text from.
+        :param image_file: The file to store the image in.
+        :param algorithm_list: A list of algorithm identifiers.
+        :param kwargs: The options of encode.
+        """
+        loop = asyncio.get_running_loop()
+        raw_text = await loop.run_in_executor(None, _read_file, text_file)
+        image_data = await self.encode(raw_text, algorithm_list, **kwargs)
+        await loop.run_in_executor(None, _write_file, image_file, image_data)
+
+    async def decode_file(self, image_file: str, text_file: str,
+                          algorithm_list: bytes) -> None:
+        """Decode an image file into a text file.
+
+        :param image_file: The file to read the image from.
+        :param text_file: The file to store the text in.
+        :param algorithm_list: A list of algorithm identifiers.
+        """
+        loop = asyncio.get_running_loop()
+        image_data = await loop.run_in_executor(None, _read_file, image_file)
+        text = await self.decode(image_data, algorithm_list)
+        await loop.run_in_executor(None, _write_file, text_file, text)
+
+    def close(self, wait: bool = True) -> None:
+        """Release the pool of threads, if the engine created it.
+
+        :param wait: Whether to wait for the pending work to finish.
+        """
+        if self._owns_executor:
+            self.executor.shutdown(wait=wait)
+
+    async def __aenter__(self) -> "AsyncEngine":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        # Waiting for the threads would block the event loop
+        await asyncio.get_running_loop().run_in_executor(None, self.close)
+
+
+if __name__ == "__main__":
+    import doctest
+
+    doctest.testmod()
@@ -0,0 +1,289 @@
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor
+from glob import glob
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+import math
+import os
+import re
+from src.cipher import get_cipher
+from src.decoder import strip_msb, write_text
+from src.encoder import check_seven_bits, randomize_msb
+from src.utilities import container, image_conversions, image_formats
+
+# Every byte of the header uses 7 bits, like the encoded text, so that it
+# survives the MSB randomization performed by the encoder.
+magic = bytes([127]) + bytes("T2IS", "ascii")
+version = 1
+header_size = len(magic) + 1 + 3 * container.length_bytes
+# Shard images are named after the text file, followed by the shard index
+_shard_name = re.compile(r".+\.\d+\.({})".format(
+    "|".join(image_formats.image_extensions)), re.IGNORECASE)
+_default_format = image_formats.formats[image_formats.default_format]
+
+
+class NotShardError(ValueError):
+    """Raised when an image does not start with the header of a shard."""
+
+
+def get_max_shard_size() -> int:
+    """Find the maximum amount of text that fits in a single shard image.
+
+    :return: The maximum amount of text bytes per shard.
+    """
+    return image_conversions.get_max_data_length() - header_size
+
+
+def encode_header(index: int, count: int, length: int) -> bytes:
+    """Build the header stored at the beginning of a shard.
+
+    :param index: The position of the shard, starting from zero.
+    :param count: The total amount of shards.
+    :param length: The amount of text bytes stored in the shard.
+    :return: The shard header.
+
+    >>> decode_header(encode_header(2, 5, 300))
+    (2, 5, 300)
+    """
+    return (magic + bytes([version]) + container.encode_length(index)
+            + container.encode_length(count)
+            + container.encode_length(length))
+
+
+def decode_header(data: bytes) -> Tuple[int, int, int]:
+    """Recover the information stored in the header of a shard.
+
+    :param data: The shard data, without the randomized MSB.
+    :return: A tuple containing the index, count and length of the shard.
+    """
+    if data[:len(magic)] != magic:
+        raise NotShardError("Image is not a shard")
+    if data[len(magic)] != version:
+        raise ValueError(f"Unsupported shard version {data[len(magic)]}")
+    offset = len(magic) + 1
+    return tuple(container.decode_length(
+        data[offset + i * container.length_bytes:])
+        for i in range(3))
+
+
+def encode_shard(text: bytes, algorithm_list: bytes, index: int, count: int,
+                 image_file: str,
+                 image_format: image_formats.ImageFormat = _default_format
+                 ) -> str:
+    """Encode a piece of text into a shard image.
+
+    :param text: The piece of text to encode, using 7 bits per byte.
+    :param algorithm_list: A list of algorithm identifiers.
+    :param index: The position of the shard, starting from zero.
+    :param count: The total amount of shards.
+    :param image_file: The file to store the shard image in.
+    :param image_format: The format of the shard image.
+    :return: The image file name.
+    """
+    encoded_text = get_cipher(algorithm_list).encode(check_seven_bits(text))
+    data = randomize_msb(encode_header(index, count, len(text)) + encoded_text)
+    image_formats.write_image_data(data, image_file, image_format)
+    return image_file
+
+
+def decode_shard(image_file: str,
+                 algorithm_list: bytes) -> Tuple[int, int, bytes]:
+    """Decode the piece of text stored in a shard image.
+
+    :param image_file: The shard image file, in any of the image formats.
+    :param algorithm_list: A list of algorithm identifiers.
+    :return: A tuple containing the index, the count of shards and the text.
+    """
+    data = strip_msb(image_formats.read_image_data(image_file))
+    index, count, length = decode_header(data)
+    encoded_text = data[header_size:header_size + length]
+    if len(encoded_text) != length:
+        raise ValueError(f"Shard {image_file} is truncated")
+    return index, count, get_cipher(algorithm_list).decode(encoded_text)
+
+
+def _run_bounded(executor: Executor, function: Callable,
+                 arguments: Iterable[tuple], window: int) -> Iterator:
+    """Run a function over a sequence of arguments in an executor.
+
+    At most a window of tasks is submitted at the same time, so the arguments
+    are consumed as the previous tasks complete.
+
+    :param executor: The executor running the tasks.
+    :param function: The function to run.
+    :param arguments: The arguments of each call.
+    :param window: The maximum amount of pending tasks.
+    :return: A generator of results, in the same order as the arguments.
+    """
+    pending = deque()
+    for args in arguments:
+        pending.append(executor.submit(function, *args))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def encode_shards(text_file: str, algorithm_list: bytes,
+                  shard_size: Optional[int] = None,
+                  max_workers: Optional[int] = None,
+                  image_format: image_formats.ImageFormat = _default_format
+                  ) -> List[str]:
+    """Encode a text file of any length into several shard images.
+
+    The text is split into pieces that fit into a single image each. Every
+    piece is encoded on its own, with a header storing its position, the
+    total amount of shards and its length. Shards are encoded in parallel.
+    The images are stored next to the text file, named after it and followed
+    by the shard index.
+
+    :param text_file: The file to read contents from.
+    :param algorithm_list: A list of algorithm identifiers.
+    :param shard_size: The maximum amount of text bytes per shard.
+    :param max_workers: The amount of worker processes.
+    :param image_format: The format of the shard images.
+    :return: The list of shard image files, in order.
+    """
+    shard_size = shard_size or get_max_shard_size()
+    if not 0 < shard_size <= get_max_shard_size():
+        raise ValueError("Shard size does not fit in an image")
+    count = max(math.ceil(os.path.getsize(text_file) / shard_size), 1)
+
+    # Get input file path and name without the file extension
+    file_id = os.path.splitext(text_file)[0]
+    digits = len(str(count - 1))
+    extension = image_format.extension
+
+    with open(text_file, "rb") as f, \
+            ProcessPoolExecutor(max_workers=max_workers) as executor:
+        pieces = container.read_frames(f, shard_size)
+        arguments = ((piece, algorithm_list, index, count,
+                      f"{file_id}.{index:0{digits}d}.{extension}",
+                      image_format)
+                     for index, piece in enumerate(pieces))
+        window = 2 * (max_workers or os.cpu_count() or 1)
+        image_files = list(_run_bounded(
+            executor, encode_shard, arguments, window))
+
+    if not image_files:
+        # Empty files still produce a single, empty, shard
+        image_files.append(encode_shard(
+            bytes(), algorithm_list, 0, 1,
+            f"{file_id}.{0:0{digits}d}.{extension}", image_format))
+    return image_files
+
+
+def find_shards(path: str) -> List[str]:
+    """List the shard image files in a directory or matching a glob pattern.
+
+    In a directory, only the images named like shards, as in
+    "notes.0.png" or "notes.0.bmp", are listed.
+
+    :param path: A directory containing the shards, or a glob pattern.
+    :return: The sorted list of image files.
+    """
+    if not os.path.isdir(path):
+        return sorted(glob(path))
+    return sorted(image_file
+                  for image_file in glob(os.path.join(path, "*.*.*"))
+                  if _shard_name.fullmatch(os.path.basename(image_file)))
+
+
+def get_text_file(shard_file: str) -> str:
+    """Name the text file decoded from a shard, without its index.
+
+    :param shard_file: The shard image file.
+    :return: The text file, in the same directory as the shard.
+
+    >>> get_text_file("./notes.v2.07.png")
+    './notes.v2.txt'
+    """
+    return f"{os.path.splitext(os.path.splitext(shard_file)[0])[0]}.txt"
+
+
+def _decode_candidate(image_file: str, algorithm_list: bytes
+                      ) -> Optional[Tuple[int, int, bytes]]:
+    """Decode a shard, or skip an image that is not one, see decode_shard."""
+    try:
+        return decode_shard(image_file, algorithm_list)
+    except NotShardError:
+        return None
+
+
+def decode_shards(path: str, algorithm_list: bytes,
+                  max_workers: Optional[int] = None) -> Iterator[bytes]:
+    """Decode the text stored in a set of shard images.
+
+    Shards are decoded in parallel and returned in the order stored in their
+    headers, regardless of the order of the files. Images without the
+    header of a shard are skipped.
+
+    :param path: A directory containing the shards, or a glob pattern.
+    :param algorithm_list: A list of algorithm identifiers.
+    :param max_workers: The amount of worker processes.
+    :return: A generator of decoded pieces of text, in order.
+    """
+    image_files = find_shards(path)
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        results = [result for result in executor.map(
+            _decode_candidate, image_files,
+            [algorithm_list] * len(image_files)) if result is not None]
+    if not results:
+        raise ValueError(f"No shards found in {path}")
+
+    shards = {}
+    count = results[0][1]
+    for index, shard_count, text in results:
+        if shard_count != count or index in shards:
+            raise ValueError("Shards belong to different encodings")
+        shards[index] = text
+    missing = set(range(count)) - set(shards)
+    if missing:
+        raise ValueError(f"Missing shards: {sorted(missing)}")
+
+    for index in range(count):
+        yield shards[index]
+
+
+def print_help(exec_name: str) -> None:
+    """Display help in console."""
+    print(f"""
+    Text to image encryption algorithm - Sharding
+
+         Usage: python3 {exec_name} encode <file name> <password> [workers]
+                        [format]
+                python3 {exec_name} decode <path> <password> [workers]
+
+    Texts too long to fit in a single image are split into several shard
+    images, encoded in parallel and stored next to the input file. To decode
+    them, the path can be either the directory containing the shards or a
+    glob pattern matching them (quoted, so the shell does not expand it).
+    Shards are written as PNG, unless another format is given, see the
+    encoding script for the available ones. Any of them can be decoded.
+    The decoded text is stored next to the first shard.
+    """)
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) < 4 or sys.argv[1] not in ("encode", "decode"):
+        print_help(sys.argv[0])
+    else:
+        mode, file_name = sys.argv[1], sys.argv[2]
+        password = bytes(sys.argv[3], "ascii")
+        workers = int(sys.argv[4]) if len(sys.argv) > 4 else None
+
+        if mode == "encode":
+            shard_format = image_formats.get_format(
+                sys.argv[5] if len(sys.argv) > 5
+                else image_formats.default_format)
+            encode_shards(file_name, password, max_workers=workers,
+                          image_format=shard_format)
+        else:
+            decoded_pieces = decode_shards(
+                file_name, password, max_workers=workers)
+            # Name the output after the first shard, without its index
+            text_file = get_text_file(find_shards(file_name)[0])
+            with open(text_file, "wb") as f:
+                write_text(decoded_pieces, f)
@@ -34,13 +34,138 @@ def bit_rep_to_bytes(bit_rep: str) -> bytes:
     >>> bit_rep_to_bytes('110011011011111101111')
     b'foo'
     """
-    string = bytes("", "ascii")
-    # Split input string into 7-bit chunks
-    byte_array = [bit_rep[i:i + 7] for i in range(0, len(bit_rep), 7)]
-    for byte in byte_array:
-        # Convert to characters and add to existing bytes object
-        string += bytes(f"{chr(int(byte, 2))}", "ascii")
-    return string
+    # Split input string into 7-bit chunks and convert each of them at once
+    return bytes([int(bit_rep[i:i + 7], 2) for i in range(0, len(bit_rep), 7)])
+
+
+def _repeat_mask(byte_mask: int, length: int) -> int:
+    """Build an integer made of the same byte repeated a number of times."""
+    return int.from_bytes(bytes([byte_mask]) * length, "big")
+
+
+def cycle_bits(string: bytes, positions: int, bits: int = 7) -> bytes:
+    """Cycle the 7-bit representation of a bytes object towards the left.
+
+    Produces the same result as cycling the output of bytes_to_bit_rep and
+    converting it back with bit_rep_to_bytes, without building the
+    intermediate string. Whole 7-bit groups are cycled by slicing the bytes
+    object, and the remaining bits are cycled by shifting the bytes as a
+    single integer, so the cost grows linearly with the input length.
+
+    :param string: The bytes object to cycle, or a memoryview of it.
+    :param positions: The amount of bits to cycle, between 0 and the total
+    amount of bits in the 7-bit representation.
+    :param bits: The amount of bits of each byte, 8 to cycle every bit of
+    the bytes object.
+    :return: The cycled bytes object.
+
+    >>> cycle_bits(bytes("a", "ascii"), 1)
+    b'C'
+    >>> cycle_bits(bytes("foo", "ascii"), 10)
+    b'~~6'
+    >>> cycle_bits(bytes("foo", "ascii"), 21)
+    b'foo'
+    >>> cycle_bits(bytes([128, 1]), 1, bits=8)
+    b'\\x00\\x03'
+    """
+    length = len(string)
+    if not length:
+        return string
+    groups, shift = divmod(positions % (length * bits), bits)
+    # Cycle whole groups, copying memoryview slices only once
+    string = bytes(string[groups:]) + bytes(string[:groups])
+    # Append the first group to merge its bits into the last one
+    size = length + 1
+    value = int.from_bytes(string + string[:1], "big")
+    low_mask = _repeat_mask((1 << (bits - shift)) - 1, size)
+    high_mask = _repeat_mask((1 << shift) - 1, size)
+    # Each group keeps its lower bits shifted left and takes the upper bits of
+    # the group that follows it
+    value = ((value & low_mask) << shift) | (
+        (value << (shift + 8 - bits)) & high_mask)
+    # Drop the appended group
+    return (value >> 8).to_bytes(length, "big")
+
+
+# Translation tables reversing the lower bits of a byte, per amount of bits
+_REVERSED_BITS = {bits: bytes([int(f"{i % 2 ** bits:0{bits}b}"[::-1], 2)
+                               for i in range(256)])
+                  for bits in (7, 8)}
+
+
+def reverse_bits(string: bytes, bits: int = 7) -> bytes:
+    """Reverse the 7-bit representation of a bytes object.
+
+    Produces the same result as reversing the output of bytes_to_bit_rep and
+    converting it back with bit_rep_to_bytes, by reversing the order of the
+    bytes and the bits of each byte through a translation table.
+
+    :param string: The bytes object to reverse, or a memoryview of it.
+    :param bits: The amount of bits of each byte, 8 to reverse every bit of
+    the bytes object.
+    :return: The reversed bytes object.
+
+    >>> reverse_bits(bytes("a", "ascii"))
+    b'C'
+    >>> reverse_bits(bytes("foo", "ascii"))
+    b'{{3'
+    >>> reverse_bits(memoryview(bytes("oof", "ascii"))[::-1])
+    b'{{3'
+    >>> reverse_bits(bytes([1, 128]), bits=8)
+    b'\\x01\\x80'
+    """
+    return bytes(string[::-1]).translate(_REVERSED_BITS[bits])
+
+
+def merge_msb(string: bytes, msb_source: bytes) -> bytes:
+    """Replace the MSB of every byte with the MSB of another bytes object.
+
+    :param string: The bytes object providing the 7 lower bits of each byte.
+    :param msb_source: The bytes object providing the MSB of each byte, of
+    the same length.
+    :return: The merged bytes object.
+
+    >>> merge_msb(bytes("foo", "ascii"), bytes([128, 0, 255]))
+    b'\\xe6o\\xef'
+    """
+    length = len(string)
+    value = int.from_bytes(string, "big") & _repeat_mask(127, length)
+    msb = int.from_bytes(msb_source, "big") & _repeat_mask(128, length)
+    return (value | msb).to_bytes(length, "big")
+
+
+def xor_bytes(string: bytes, key: bytes) -> bytes:
+    """Apply the XOR operation between two bytes objects of the same length.
+
+    Both objects are converted into single integers so the operation runs in
+    one step instead of byte by byte.
+
+    :param string: The bytes object to modify.
+    :param key: The bytes object to XOR with.
+    :return: The result of the XOR operation, as a bytes object.
+
+    >>> xor_bytes(bytes("foo", "ascii"), bytes([1, 2, 3]))
+    b'gml'
+    """
+    value = int.from_bytes(string, "big") ^ int.from_bytes(key, "big")
+    return value.to_bytes(len(string), "big")
+
+
+def xor_into(buffer: bytearray, key: bytes) -> None:
+    """Apply the XOR operation between a buffer and a bytes object in place.
+
+    See xor_bytes. The result replaces the contents of the buffer.
+
+    :param buffer: The bytearray or writable memoryview to modify.
+    :param key: The bytes object to XOR with, of the same length.
+
+    >>> buffer = bytearray("foo", "ascii")
+    >>> xor_into(buffer, bytes([1, 2, 3]))
+    >>> buffer
+    bytearray(b'gml')
+    """
+    value = int.from_bytes(buffer, "big") ^ int.from_bytes(key, "big")
+    buffer[:] = value.to_bytes(len(buffer), "big")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,108 @@
+from typing import NamedTuple, Optional
+import bz2
+import lzma
+import zlib
+
+
+class Compression(NamedTuple):
+    """Codec from the standard library compressing the text before encoding.
+
+    The identifier is stored in the container header, so the decoder knows
+    how to decompress the text. The level only affects compression.
+    """
+    name: str
+    identifier: int
+    level: Optional[int] = None
+
+    def compress(self, data: bytes) -> bytes:
+        """Compress a frame of the text.
+
+        :param data: The data to compress.
+        :return: The compressed data.
+        """
+        if self.name == "zlib":
+            return zlib.compress(data, -1 if self.level is None else self.level)
+        if self.name == "lzma":
+            return lzma.compress(data, preset=self.level)
+        if self.name == "bz2":
+            return bz2.compress(data, 9 if self.level is None else self.level)
+        return bytes(data)
+
+    def decompress(self, data: bytes) -> bytes:
+        """Recover a frame of the text.
+
+        :param data: The compressed data.
+        :return: The original data.
+
+        >>> codec = get_compression("bz2:1")
+        >>> codec.decompress(codec.compress(bytes("abc", "ascii")))
+        b'abc'
+        """
+        if self.name == "zlib":
+            return zlib.decompress(data)
+        if self.name == "lzma":
+            return lzma.decompress(data)
+        if self.name == "bz2":
+            return bz2.decompress(data)
+        return bytes(data)
+
+
+# Codecs by name, and the range of their compression levels
+codecs = {
+    "none": Compression("none", 0),
+    "zlib": Compression("zlib", 1),
+    "lzma": Compression("lzma", 2),
+    "bz2": Compression("bz2", 3),
+}
+levels = {"zlib": range(0, 10), "lzma": range(0, 10), "bz2": range(1, 10)}
+
+
+def get_compression(spec: str = "none") -> Compression:
+    """Obtain a codec from its name and optional compression level.
+
+    :param spec: The name of the codec, "none", "zlib", "lzma" or "bz2",
+    optionally followed by a compression level after a colon.
+    :return: The codec, with the level to compress with.
+
+    >>> get_compression("zlib:9")
+    Compression(name='zlib', identifier=1, level=9)
+    >>> get_compression("bz2:0")
+    Traceback (most recent call last):
+    ...
+    ValueError: Invalid compression level for bz2: 0
+    >>> get_compression("gzip")
+    Traceback (most recent call last):
+    ...
+    ValueError: Unknown compression: gzip
+    """
+    name, _, level = spec.lower().partition(":")
+    if name not in codecs:
+        raise ValueError(f"Unknown compression: {name}")
+    codec = codecs[name]
+    if not level:
+        return codec
+    if name not in levels or not level.isdigit() \
+            or int(level) not in levels[name]:
+        raise ValueError(f"Invalid compression level for {name}: {level}")
+    return codec._replace(level=int(level))
+
+
+def from_identifier(identifier: int) -> Compression:
+    """Obtain the codec stored in a container header.
+
+    :param identifier: The identifier of the codec.
+    :return: The codec.
+
+    >>> from_identifier(2).name
+    'lzma'
+    """
+    for codec in codecs.values():
+        if codec.identifier == identifier:
+            return codec
+    raise ValueError(f"Unknown compression identifier {identifier}")
+
+
+if __name__ == "__main__":
+    import doctest
+
+    doctest.testmod()
@@ -0,0 +1,433 @@
+from typing import BinaryIO, Iterable, Iterator, NamedTuple, Optional
+from src.algorithms.plan import Plan
+from src.utilities import compression as compressions
+from src.utilities import metrics
+from src.utilities.compression import Compression
+import hmac
+import os
+import random
+
+# Every byte of the container uses 7 bits, like the encoded text, so that it
+# survives the MSB randomization performed by the encoder.
+magic = bytes([127]) + bytes("T2IF", "ascii")
+# Dense containers store 8 bits of the text in every byte of their frames,
+# without randomized MSB, see plan.Plan. The rest of the container still uses
+# 7 bits per byte.
+dense_magic = bytes([127]) + bytes("T2I8", "ascii")
+version = 3
+# Version 1 has no password check and version 2 has no compression, and both
+# are still decoded
+supported_versions = (1, 2, 3)
+length_bytes = 5
+max_frame_size = 2 ** (7 * length_bytes) - 1
+default_frame_size = 2 ** 20
+salt_bytes = 8
+check_bytes = 5
+max_header_size = len(magic) + 2 + length_bytes + salt_bytes + check_bytes
+
+
+class Header(NamedTuple):
+    """Fields of a container header, as found by read_header."""
+    frame_size: int
+    size: int
+    compression: Compression
+
+
+class PasswordError(ValueError):
+    """The password does not match the one used to encode the container."""
+
+
+def password_check(algorithm_list: bytes, salt: bytes) -> bytes:
+    """Derive the value stored in the header to verify the password.
+
+    The value is keyed by the algorithm list and salted, so images encoded
+    with the same password do not share it. It holds 35 bits, so a wrong
+    password passes the check once every 2 ** 35 attempts.
+
+    :param algorithm_list: The list of algorithm identifiers.
+    :param salt: The salt stored in the header.
+    :return: The check value, using 7 bits per byte.
+
+    >>> len(password_check(bytes("hfb3", "ascii"), bytes(salt_bytes)))
+    5
+    """
+    digest = hmac.new(algorithm_list, salt, "sha256").digest()
+    return bytes(byte & 127 for byte in digest[:check_bytes])
+
+
+def encode_header(plan: Plan, frame_size: int,
+                  rng: Optional[random.Random] = None,
+                  compression: Compression = compressions.codecs["none"]
+                  ) -> bytes:
+    """Create the header of a container.
+
+    :param plan: The compiled algorithm list, keying the password check.
+    Dense plans, working on 8 bits per byte, use the dense magic bytes.
+    :param frame_size: The maximum size of each frame.
+    :param rng: The random generator for the salt. Defaults to the random
+    source of the operating system.
+    :param compression: The codec compressing every frame.
+    :return: The header, using 7 bits per byte.
+    """
+    salt = rng.randbytes(salt_bytes) if rng else os.urandom(salt_bytes)
+    salt = bytes(byte & 127 for byte in salt)
+    header_magic = dense_magic if plan.bits == 8 else magic
+    return b"".join((header_magic, bytes([version]),
+                     encode_length(frame_size),
+                     bytes([compression.identifier]), salt,
+                     password_check(plan.algorithm_list, salt)))
+
+
+def read_header(data: bytes, plan: Plan) -> Optional[Header]:
+    """Validate the header of a container and verify the password.
+
+    Only the header is read, so a wrong password is rejected before
+    decoding any frame.
+
+    :param data: The start of the container data, without the randomized
+    MSB.
+    :param plan: The compiled algorithm list.
+    :return: The fields of the header, or None if the data is too short to
+    hold the header.
+
+    >>> from src.algorithms.plan import compile_plan
+    >>> header = encode_header(compile_plan(bytes("hf", "ascii")), 6)
+    >>> read_header(header, compile_plan(bytes("hf", "ascii")))[:2]
+    (6, 25)
+    >>> read_header(header, compile_plan(bytes("fh", "ascii")))
+    Traceback (most recent call last):
+    ...
+    src.utilities.container.PasswordError: Wrong password for this image
+    """
+    if len(data) <= len(magic):
+        return None
+    if not is_container(data):
+        raise ValueError("Data does not use the container format")
+    if is_dense(data) != (plan.bits == 8):
+        raise ValueError("The plan does not use the bits of the container")
+    data_version = data[len(magic)]
+    if data_version not in supported_versions:
+        raise ValueError(f"Unsupported container version {data_version}")
+
+    position = len(magic) + 1 + length_bytes
+    frame_size = decode_length(data[len(magic) + 1:position])
+    codec = compressions.codecs["none"]
+    if data_version > 2:
+        if len(data) <= position:
+            return None
+        codec = compressions.from_identifier(data[position])
+        position += 1
+        if codec.identifier and plan.bits != 8:
+            raise ValueError("Compressed containers must be dense")
+    header_size = position
+    if data_version > 1:
+        header_size += salt_bytes + check_bytes
+    if len(data) < header_size:
+        return None
+
+    if data_version > 1:
+        salt = bytes(data[position:position + salt_bytes])
+        check = password_check(plan.algorithm_list, salt)
+        if not hmac.compare_digest(
+                check, bytes(data[position + salt_bytes:header_size])):
+            raise PasswordError("Wrong password for this image")
+    return Header(frame_size, header_size, codec)
+
+
+def encode_length(length: int) -> bytes:
+    """Convert a length into its container representation.
+
+    :param length: The length to convert.
+    :return: The length in base 128, as a bytes object of fixed size.
+
+    >>> encode_length(300)
+    b'\\x00\\x00\\x00\\x02,'
+    """
+    if not 0 <= length <= max_frame_size:
+        raise ValueError("Length does not fit in the container format")
+    return bytes([(length >> (7 * i)) & 127
+                  for i in range(length_bytes - 1, -1, -1)])
+
+
+def decode_length(data: bytes) -> int:
+    """Recover a length from its container representation.
+
+    :param data: The bytes storing the length.
+    :return: The length.
+
+    >>> decode_length(encode_length(300))
+    300
+    """
+    length = 0
+    for byte in data[:length_bytes]:
+        length = (length << 7) + byte
+    return length
+
+
+def is_container(data: bytes) -> bool:
+    """Check whether the data starts with a container header.
+
+    :param data: The decoded image data, without the randomized MSB.
+    :return: True if the data uses the container format.
+
+    >>> is_container(magic + bytes([version]))
+    True
+    >>> is_container(bytes("Hello", "ascii"))
+    False
+    """
+    return data[:len(magic)] in (magic, dense_magic)
+
+
+def is_dense(data: bytes) -> bool:
+    """Check whether the data starts with a dense container header.
+
+    :param data: The start of the image data.
+    :return: True if the frames of the container use 8 bits per byte.
+
+    >>> is_dense(dense_magic + bytes([version]))
+    True
+    >>> is_dense(magic + bytes([version]))
+    False
+    """
+    return data[:len(dense_magic)] == dense_magic
+
+
+def read_frames(stream: BinaryIO, frame_size: int) -> Iterator[bytes]:
+    """Read a binary stream in frames of a fixed size.
+
+    :param stream: The stream to read.
+    :param frame_size: The maximum size of each frame.
+    :return: A generator of frames, the last one possibly shorter.
+    """
+    return iter(lambda: metrics.timed("read", stream.read, frame_size), b"")
+
+
+def split_frames(data: memoryview, frame_size: int) -> Iterator[memoryview]:
+    """Split a buffer in frames of a fixed size, without copying it.
+
+    :param data: The buffer to split, such as a memory-mapped file.
+    :param frame_size: The maximum size of each frame.
+    :return: A generator of views of the buffer, the last one possibly
+    shorter.
+
+    >>> [bytes(frame) for frame in split_frames(memoryview(b"abcde"), 2)]
+    [b'ab', b'cd', b'e']
+    """
+    return (data[i:i + frame_size] for i in range(0, len(data), frame_size))
+
+
+def encode_frames(frames: Iterable[bytes], plan: Plan,
+                  frame_size: int = default_frame_size,
+                  rng: Optional[random.Random] = None,
+                  compression: Compression = compressions.codecs["none"]
+                  ) -> Iterator[bytes]:
+    """Encode a sequence of frames into the container format.
+
+    The container starts with the magic bytes, the format version, the frame
+    size, the compression codec and the password check, see encode_header.
+    Each frame follows, preceded by its length and compressed and encoded on
+    its own through the plan, and a frame of length zero closes the
+    container.
+
+    :param frames: The frames to encode, no longer than the frame size.
+    :param plan: The compiled algorithm list.
+    :param frame_size: The maximum size of each frame.
+    :param rng: The random generator for the salt, see encode_header.
+    :param compression: The codec compressing every frame before the plan.
+    The compressed data uses 8 bits per byte, so the plan must be dense.
+    :return: A generator of container pieces.
+
+    >>> from src.algorithms.plan import compile_plan
+    >>> p = compile_plan(bytes("hf", "ascii"), 8)
+    >>> codec = compressions.get_compression("zlib")
+    >>> frames = [bytes("Hello " * 100, "ascii")]
+    >>> data = b"".join(encode_frames(frames, p, 600, compression=codec))
+    >>> len(data) < 100, b"".join(decode_frames([data], p)) == frames[0]
+    (True, True)
+    """
+    if compression.identifier and plan.bits != 8:
+        raise ValueError("Compressed containers must be dense")
+    yield encode_header(plan, frame_size, rng, compression)
+    for frame in frames:
+        if not frame:
+            continue
+        if len(frame) > frame_size:
+            raise ValueError("Frame is longer than the container frame size")
+        if compression.identifier:
+            frame = metrics.timed("compress", compression.compress, frame)
+        # Layers may return views of the frame, copied once here
+        yield encode_length(len(frame)) + bytes(plan.encode(frame))
+    yield encode_length(0)
+
+
+def get_container_length(text_length: int, frame_size: int) -> int:
+    """Compute the length of an uncompressed container holding a text.
+
+    The layers keep the length of each frame, so the container can be
+    sized before encoding it, as when streaming it into an image.
+
+    :param text_length: The amount of bytes of the text.
+    :param frame_size: The maximum size of each frame.
+    :return: The amount of bytes of the container, see encode_frames.
+
+    >>> from src.algorithms.plan import compile_plan
+    >>> frames = [bytes(6), bytes(5)]
+    >>> data = b"".join(encode_frames(frames, compile_plan(b"hf"), 6))
+    >>> len(data) == get_container_length(11, 6)
+    True
+    """
+    frame_count = -(-text_length // frame_size)
+    # Headers of the current version hold every field
+    return (max_header_size + frame_count * length_bytes + text_length
+            + length_bytes)
+
+
+def decode_frames(chunks: Iterable[bytes], plan: Plan) -> Iterator[bytes]:
+    """Decode the frames of a container.
+
+    The container can be provided in chunks of any size. Only the frame
+    being decoded is kept in memory. The password is verified before
+    decoding the first frame, see read_header.
+
+    :param chunks: The container data, without the randomized MSB.
+    :param plan: The compiled algorithm list.
+    :return: A generator of decoded frames.
+
+    >>> from src.algorithms.plan import compile_plan
+    >>> p = compile_plan(bytes("fhe", "ascii"))
+    >>> frames = [bytes("Hello ", "ascii"), bytes("world", "ascii")]
+    >>> data = b"".join(encode_frames(frames, p, 6))
+    >>> list(decode_frames([data[i:i + 4] for i in range(0, len(data), 4)], p))
+    [b'Hello ', b'world']
+    """
+    buffer = bytearray()
+    header = None
+    frame_length = None
+    for chunk in chunks:
+        buffer += chunk
+        if header is None:
+            header = read_header(buffer, plan)
+            if header is None:
+                continue
+            del buffer[:header.size]
+
+        while True:
+            if frame_length is None:
+                if len(buffer) < length_bytes:
+                    break
+                frame_length = decode_length(buffer)
+                del buffer[:length_bytes]
+                if frame_length == 0:
+                    return
+                if frame_length > _max_stored_length(header):
+                    raise ValueError("Frame is longer than the frame size")
+            if len(buffer) < frame_length:
+                break
+            frame = plan.decode(bytes(buffer[:frame_length]))
+            if header.compression.identifier:
+                frame = metrics.timed(
+                    "decompress", header.compression.decompress, frame)
+            yield frame
+            del buffer[:frame_length]
+            frame_length = None
+
+    raise ValueError("Container data is truncated")
+
+
+def decode_range(data: bytes, plan: Plan, start: int, length: int) -> bytes:
+    """Decode a span of the text stored in a container.
+
+    The frame lengths are read to find the frames overlapping the span,
+    and only the part of the span within each of them is decoded, see
+    Plan.decode_range. Compressed frames do not store the length of their
+    text, so they are decoded in order up to the end of the span instead.
+    Like slicing, spans past the end of the text are shortened.
+
+    :param data: The container data, without the randomized MSB.
+    :param plan: The compiled algorithm list.
+    :param start: The position of the first decoded byte of the text.
+    :param length: The amount of bytes to decode.
+    :return: The decoded span of the text.
+
+    >>> from src.algorithms.plan import compile_plan
+    >>> p = compile_plan(bytes("fhe", "ascii"))
+    >>> frames = [bytes("Hello ", "ascii"), bytes("world", "ascii")]
+    >>> data = b"".join(encode_frames(frames, p, 6))
+    >>> decode_range(data, p, 4, 4)
+    b'o wo'
+    """
+    if start < 0 or length < 0:
+        raise ValueError("Ranges cannot be negative")
+    header = read_header(data, plan)
+    if header is None:
+        raise ValueError("Container data is truncated")
+    if header.compression.identifier:
+        return _decode_compressed_range(data, plan, start, length)
+
+    pieces = []
+    position = header.size
+    text_position = 0
+    end = start + length
+    while text_position < end:
+        if len(data) < position + length_bytes:
+            raise ValueError("Container data is truncated")
+        frame_length = decode_length(data[position:position + length_bytes])
+        position += length_bytes
+        if frame_length == 0:
+            break
+        if frame_length > header.frame_size:
+            raise ValueError("Frame is longer than the frame size")
+        if len(data) < position + frame_length:
+            raise ValueError("Container data is truncated")
+
+        frame_end = text_position + frame_length
+        if frame_end > start:
+            frame_start = max(start - text_position, 0)
+            pieces.append(plan.decode_range(
+                data[position:position + frame_length], frame_start,
+                min(end, frame_end) - text_position - frame_start))
+        position += frame_length
+        text_position = frame_end
+    return b"".join(pieces)
+
+
+def _decode_compressed_range(data: bytes, plan: Plan, start: int,
+                             length: int) -> bytes:
+    """Decode a span of the text stored in a compressed container.
+
+    See decode_range.
+    """
+    pieces = []
+    text_position = 0
+    end = start + length
+    frames = decode_frames([data], plan)
+    for frame in frames:
+        frame_end = text_position + len(frame)
+        if frame_end > start:
+            pieces.append(frame[max(start - text_position, 0):
+                                end - text_position])
+        text_position = frame_end
+        if text_position >= end:
+            frames.close()
+            break
+    return b"".join(pieces)
+
+
+def _max_stored_length(header: Header) -> int:
+    """Find the longest frame a container may store, once encoded.
+
+    Compressed frames may grow past the frame size when they barely
+    compress, by a few bytes per block of data.
+
+    :param header: The header of the container.
+    :return: The maximum length of a stored frame.
+    """
+    if not header.compression.identifier:
+        return header.frame_size
+    return header.frame_size + header.frame_size // 64 + 1024
+
+
+if __name__ == "__main__":
+    import doctest
+
+    doctest.testmod()
@@ -0,0 +1,54 @@
+from contextlib import contextmanager
+from typing import IO, Iterator
+import os
+import tempfile
+
+# Temporary files are private, give new files the usual permissions instead
+_file_permissions = 0o644
+
+
+@contextmanager
+def atomic_write(file_name: str, mode: str = "wb") -> Iterator[IO]:
+    """Open a file for writing so that it only appears once complete.
+
+    The contents are written to a temporary file in the same directory, which
+    replaces the target file when the block finishes without errors. If an
+    error is raised, the temporary file is removed and the target file is left
+    untouched. The file keeps the permissions of the target file it replaces,
+    and new files are readable by everyone but only writable by their owner.
+
+    :param file_name: The file to write.
+    :param mode: The mode used to open the file, either text or binary.
+    :return: A context manager yielding the open temporary file.
+
+    >>> import os, tempfile
+    >>> directory = tempfile.mkdtemp()
+    >>> with atomic_write(os.path.join(directory, "a.txt"), "w") as f:
+    ...     _ = f.write("Hello")
+    >>> os.listdir(directory)
+    ['a.txt']
+    >>> oct(os.stat(os.path.join(directory, "a.txt")).st_mode & 0o777)
+    '0o644'
+    """
+    directory = os.path.dirname(os.path.abspath(file_name))
+    prefix = f".{os.path.basename(file_name)}."
+    descriptor, temp_name = tempfile.mkstemp(
+        dir=directory, prefix=prefix, suffix=".tmp")
+    try:
+        with os.fdopen(descriptor, mode) as f:
+            yield f
+        try:
+            permissions = os.stat(file_name).st_mode & 0o7777
+        except FileNotFoundError:
+            permissions = _file_permissions
+        os.chmod(temp_name, permissions)
+        os.replace(temp_name, file_name)
+    except BaseException:
+        os.unlink(temp_name)
+        raise
+
+
+if __name__ == "__main__":
+    import doctest
+
+    doctest.testmod()
@@ -1,9 +1,11 @@
-from typing import Tuple
+from functools import lru_cache
+from typing import Iterable, Iterator, List, Optional, Tuple
+from src.utilities import metrics
 import math
-from random import choices as random_choices
-from PIL import Image
+import random
 
 padding_info_bytes = 2
+max_padding = 2 ** (8 * padding_info_bytes) - 1
 
 
 def get_min_image_size(data: bytearray) -> Tuple[int, int]:
@@ -17,7 +19,35 @@ def get_min_image_size(data: bytearray) -> Tuple[int, int]:
     :param data: The array of bytes to calculate the dimensions from.
     :return: A two-value tuple containing the minimum amount of pixels per side.
     """
-    data_bytes = len(data) + padding_info_bytes
+    return _get_image_size(len(data))
+
+
+def _get_image_size(data_length: int) -> Tuple[int, int]:
+    """Find the minimum pixels per side for an amount of bytes of data.
+
+    See get_min_image_size. Data too long for the padding of the original
+    layout, see get_max_data_length, is stored in a square of the pixels it
+    fills instead, so the padding takes about a row at most. The decoder
+    does not depend on the size of the image, so it reads both layouts.
+
+    >>> _get_image_size(10), _get_image_size(40000)
+    ((3, 4), (115, 116))
+    """
+    short_side, long_side = _get_square_size(data_length)
+    if short_side * long_side * 3 - data_length - padding_info_bytes \
+            <= max_padding:
+        return short_side, long_side
+
+    pixels = math.ceil((data_length + padding_info_bytes) / 3)
+    short_side = math.isqrt(pixels)
+    long_side = math.ceil(pixels / short_side)
+    return short_side, long_side
+
+
+def _get_square_size(data_length: int) -> Tuple[int, int]:
+    """Find the pixels per side of the original layout, see _get_image_size.
+    """
+    data_bytes = data_length + padding_info_bytes
     # Align to RGB pixel sizes
     pixel_bytes = data_bytes + data_bytes % 3
 
@@ -26,7 +56,41 @@ def get_min_image_size(data: bytearray) -> Tuple[int, int]:
     return short_side, long_side
 
 
-def bytes_to_image(data: bytearray) -> Image:
+def get_padding_count(data_length: int) -> int:
+    """Calculate the amount of padding bytes added to the data of an image.
+
+    :param data_length: The amount of bytes of data.
+    :return: The amount of padding bytes.
+    """
+    short_side, long_side = _get_image_size(data_length)
+    return short_side * long_side * 3 - data_length - padding_info_bytes
+
+
+@lru_cache(maxsize=None)
+def get_max_data_length() -> int:
+    """Find the longest data stored in an image of the original layout.
+
+    Every length up to the returned value produces an amount of padding that
+    fits in the padding information bytes, and is stored in the same image
+    as always. Longer data is stored in images sized by their pixels, see
+    _get_image_size, which hold above a gigabyte.
+
+    :return: The maximum amount of bytes of data.
+
+    >>> get_max_data_length()
+    32576
+    """
+    data_length = 0
+    while True:
+        short_side, long_side = _get_square_size(data_length + 1)
+        if short_side * long_side * 3 - data_length - 1 - padding_info_bytes \
+                > max_padding:
+            return data_length
+        data_length += 1
+
+
+def bytes_to_image(data: bytearray,
+                   rng: Optional[random.Random] = None) -> "Image":
     """Convert a bytes object into a PIL Image with RGB format
 
     This function takes a bytes object and builds an RGB image by assigning a
@@ -44,55 +108,239 @@ def bytes_to_image(data: bytearray) -> Image:
     The amount of bytes that contain the number of padded bytes is defined at
     the top of this file.
 
+    The padding is drawn from a random generator owned by the call, so
+    concurrent calls do not share any state.
+
     :param data: The byte array object to convert.
+    :param rng: The random generator for the padding. Defaults to a new
+    generator seeded by the operating system.
     :return: A PIL.Image with RGB format.
     """
+    from PIL import Image
+
     # Obtain squared dimensions
     short_side, long_side = get_min_image_size(data)
+    padding_info, padding = _get_padding(data, rng)
+
+    # Merge byte arrays
+    data = b"".join((padding_info, data, padding))
+
+    image = Image.frombytes("RGB", (short_side, long_side), data)
+    return image
+
+
+def _get_padding(data: bytearray,
+                 rng: Optional[random.Random]) -> Tuple[bytes, bytes]:
+    """Create the padding information and the padding of an image.
+
+    See bytes_to_image.
+
+    :return: The bytes stored before and after the data.
+    """
     # Calculate necessary padding bytes
-    pad_count = short_side * long_side * 3 - len(data) - padding_info_bytes
+    pad_count = _check_padding_count(len(data))
+    rng = rng or random.Random()
+    padding = _sample_padding(data, pad_count, rng)
+
+    # Add padding info in front of padded data, with decreasing significance
+    padding_info = pad_count.to_bytes(padding_info_bytes, "big")
+    return padding_info, padding
+
+
+def _check_padding_count(data_length: int) -> int:
+    """Calculate the padding bytes of an image, if they can be stored."""
+    pad_count = get_padding_count(data_length)
 
     # N bytes of padding at most
-    if pad_count > 2 ** (8 * padding_info_bytes) - 1:
+    if pad_count > max_padding:
         raise ValueError("Text is too long to be encoded in an image")
+    return pad_count
 
-    # Create padding bytes from sample
-    padding = bytearray()
-    for byte in random_choices(data, k=pad_count):
-        padding.append(byte)
 
-    # Add padding info in front of padded data
-    padding_info = bytearray()
-    # Split padding into N bytes
-    for i in range(padding_info_bytes):
-        padding_info.append(pad_count & 255)
-        pad_count = pad_count >> 8
-    # Decreasing signifiance
-    padding_info.reverse()
+def _sample_padding(data: bytes, pad_count: int,
+                    rng: random.Random) -> bytes:
+    """Create padding bytes from values sampled from the data."""
+    # Random bytes select one of 256 values sampled from the data through a
+    # translation table
+    sample = bytes(rng.choices(data, k=256)) if data else bytes(256)
+    return rng.randbytes(pad_count).translate(sample)
 
-    # Merge byte arrays
-    data = padding_info + data + padding
 
-    image = Image.frombytes("RGB", (short_side, long_side), bytes(data))
-    return image
+def bytes_to_rows(data: bytearray, rng: Optional[random.Random] = None
+                  ) -> Tuple[int, int, Iterator[bytes]]:
+    """Split a bytes object into the scanlines of an RGB image.
 
+    Builds the same image as bytes_to_image, padding included, without PIL.
+    The scanlines are sliced from the data as they are requested, and the
+    padding only joins the last ones, so the data is not copied into a
+    single buffer.
 
-def image_to_bytes(data: Image) -> bytearray:
-    """Recover the bytes object used to create a PIL Image with RGB format.
+    :param data: The byte array object to convert.
+    :param rng: The random generator for the padding, see bytes_to_image.
+    :return: The width and height of the image, in pixels, and a generator
+    of its scanlines from top to bottom.
 
-    Follows the procedure defined in bytes_to_image, but in inverse order:
-    The padding is removed from the Image object and the bytes are recovered
-    through PIL's Image.tobytes() method.
+    >>> width, height, rows = bytes_to_rows(bytearray(b"Hello"))
+    >>> width, height, [len(row) for row in rows]
+    (2, 4, [6, 6, 6, 6])
+    """
+    short_side, long_side = get_min_image_size(data)
+    padding_info, padding = _get_padding(data, rng)
+    return short_side, long_side, _iter_rows(
+        (padding_info, data, padding), short_side * 3)
 
-    :param data: The PIL Image.
-    :return: The byte array object used to create the input Image.
+
+def pieces_to_rows(pieces: Iterable[bytes], data_length: int,
+                   rng: Optional[random.Random] = None
+                   ) -> Tuple[int, int, Iterator[bytes]]:
+    """Split data arriving in pieces into the scanlines of an RGB image.
+
+    Builds the same image as bytes_to_rows for the pieces joined, except for
+    the padding values, which are sampled from the longest piece. The
+    length of the data, which determines the size of the image, must be
+    known in advance, and each piece is cut into scanlines as it arrives, so
+    the data is never held in memory at once.
+
+    :param pieces: The data, in consecutive pieces.
+    :param data_length: The total amount of bytes of the pieces.
+    :param rng: The random generator for the padding, see bytes_to_image.
+    :return: The width and height of the image, in pixels, and a generator
+    of its scanlines from top to bottom.
+
+    >>> width, height, rows = pieces_to_rows([b"Hel", b"lo"], 5)
+    >>> rows_to_bytes(rows)
+    bytearray(b'Hello')
+    """
+    short_side, long_side = _get_image_size(data_length)
+    pad_count = _check_padding_count(data_length)
+    return short_side, long_side, _iter_rows(
+        _pad_pieces(pieces, data_length, pad_count, rng or random.Random()),
+        short_side * 3)
+
+
+def _pad_pieces(pieces: Iterable[bytes], data_length: int, pad_count: int,
+                rng: random.Random) -> Iterator[bytes]:
+    """Surround the pieces of data with the padding, see pieces_to_rows."""
+    yield pad_count.to_bytes(padding_info_bytes, "big")
+    length = 0
+    longest = bytes()
+    for piece in pieces:
+        length += len(piece)
+        if len(piece) > len(longest):
+            longest = piece
+        yield piece
+    if length != data_length:
+        raise ValueError("Data does not match the length of the image")
+    yield _sample_padding(longest, pad_count, rng)
+
+
+def rows_to_pieces(rows: Iterable[bytes]) -> Iterator[bytes]:
+    """Recover the data from the scanlines of an RGB image, as they arrive.
+
+    Follows rows_to_bytes, without joining the scanlines, so the data is
+    never held in memory at once. The size of the image is taken from the
+    first scanline, so the amount of scanlines must match the height.
+
+    :param rows: The scanlines of the image, from top to bottom.
+    :return: A generator of consecutive pieces of the data.
+
+    >>> width, height, rows = bytes_to_rows(bytearray(b"Hello"))
+    >>> b"".join(rows_to_pieces(rows))
+    b'Hello'
     """
-    data_byte_arr = bytearray(data.tobytes())
+    rows = iter(rows)
+    first_row = next(rows, bytes())
+    return _strip_rows(first_row, rows)
+
 
+def _strip_rows(first_row: bytes, rows: Iterator[bytes]) -> Iterator[bytes]:
+    """Yield the data of the scanlines, without the padding information."""
+    pending = bytearray(first_row)
+    # The padding information may span the first scanlines of narrow images
+    while len(pending) < padding_info_bytes:
+        row = next(rows, None)
+        if row is None:
+            return
+        pending += row
+    padding = int.from_bytes(pending[:padding_info_bytes], "big")
+    del pending[:padding_info_bytes]
+
+    for row in rows:
+        piece = metrics.timed("from_image", _hold_back, row, pending, padding)
+        if piece:
+            yield piece
+    if len(pending) > padding:
+        yield bytes(pending[:len(pending) - padding])
+
+
+def _hold_back(row: bytes, pending: bytearray, padding: int) -> bytes:
+    """Add a scanline to the pending data, and take the data before the
+    last padding bytes out of it.
+
+    The padding only fills the last scanlines, so each scanline is held
+    back until it is known whether padding follows.
+    """
+    pending += row
+    if len(pending) <= padding:
+        return bytes()
+    piece = bytes(pending[:len(pending) - padding])
+    del pending[:len(pending) - padding]
+    return piece
+
+
+def _iter_rows(pieces: Iterable[bytes], row_size: int) -> Iterator[bytes]:
+    """Cut consecutive pieces of data into rows of the same size."""
+    pending = bytearray()
+    for piece in pieces:
+        yield from metrics.timed("to_image", _cut_rows, piece, pending,
+                                 row_size)
+    if pending:
+        raise ValueError("Data does not fill the last row of the image")
+
+
+def _cut_rows(piece: bytes, pending: bytearray,
+              row_size: int) -> List[bytes]:
+    """Cut the rows completed by a piece of data, see _iter_rows.
+
+    The rows are sliced from the piece without copying it, except for the
+    one joining the pending data of previous pieces. The end of the piece
+    is kept in the pending data.
+    """
+    view = memoryview(piece)
+    rows = []
+    start = 0
+    if pending:
+        start = min(row_size - len(pending), len(view))
+        pending += view[:start]
+        if len(pending) < row_size:
+            return rows
+        rows.append(bytes(pending))
+        pending.clear()
+    end = start + (len(view) - start) // row_size * row_size
+    rows.extend(view[i:i + row_size] for i in range(start, end, row_size))
+    pending += view[end:]
+    return rows
+
+
+def rows_to_bytes(rows: Iterable[bytes]) -> bytearray:
+    """Recover the bytes object from the scanlines of an RGB image.
+
+    Follows image_to_bytes, for images read without PIL, see bytes_to_rows.
+
+    :param rows: The scanlines of the image, from top to bottom.
+    :return: The byte array object used to create the image.
+
+    >>> rows_to_bytes(bytes_to_rows(bytearray(b"Hello"))[2])
+    bytearray(b'Hello')
+    """
+    data_byte_arr = bytearray().join(rows)
+    return metrics.timed("from_image", _strip_padding, data_byte_arr)
+
+
+def _strip_padding(data_byte_arr: bytearray) -> bytearray:
+    """Remove the padding information and the padding from image data."""
     # Rebuild padding value from first bytes
-    padding = 0
-    for i in range(padding_info_bytes):
-        padding += data_byte_arr[i] << (padding_info_bytes - i - 1) * 8
+    padding = int.from_bytes(data_byte_arr[:padding_info_bytes], "big")
 
     if padding:
         # Avoid negative zero padding value
@@ -101,3 +349,22 @@ def image_to_bytes(data: Image) -> bytearray:
         data_bytes = data_byte_arr[padding_info_bytes:]
 
     return data_bytes
+
+
+def image_to_bytes(data: "Image") -> bytearray:
+    """Recover the bytes object used to create a PIL Image with RGB format.
+
+    Follows the procedure defined in bytes_to_image, but in inverse order:
+    The padding is removed from the Image object and the bytes are recovered
+    through PIL's Image.tobytes() method.
+
+    :param data: The PIL Image.
+    :return: The byte array object used to create the input Image.
+    """
+    return _strip_padding(bytearray(data.tobytes()))
+
+
+if __name__ == "__main__":
+    import doctest
+
+    doctest.testmod()
@@ -0,0 +1,284 @@
+from typing import BinaryIO, Iterable, Iterator, NamedTuple, Optional, Union
+import io
+import random
+from src.utilities import image_conversions, metrics, png
+
+
+class ImageFormat(NamedTuple):
+    """Lossless file format used to store the encoded images.
+
+    The options are passed to PIL when saving the image. PNG files are
+    written and read by the built-in codec of png.py instead, which only
+    takes the compression level. Decoding does not depend on the format, as
+    it is detected from the contents of the file.
+    """
+    name: str
+    pil_format: str
+    extension: str
+    options: dict
+
+
+# The encoded data is random, so compressing it barely reduces the file size.
+# Uncompressed formats and low PNG compression levels are much faster to
+# write, at the cost of a slightly bigger file.
+formats = {
+    "png": ImageFormat("png", "PNG", "png", {"optimize": False}),
+    "bmp": ImageFormat("bmp", "BMP", "bmp", {}),
+    "tiff": ImageFormat("tiff", "TIFF", "tiff", {"compression": "raw"}),
+    "ppm": ImageFormat("ppm", "PPM", "ppm", {}),
+}
+default_format = "png"
+# Extensions of the files that may contain encoded images
+image_extensions = tuple(sorted({image_format.extension
+                                 for image_format in formats.values()}))
+
+
+def get_format(spec: str = default_format) -> ImageFormat:
+    """Obtain an image format from its name and optional compression level.
+
+    :param spec: The name of the format, such as "png", "bmp", "tiff" or
+    "ppm". PNG accepts a compression level between 0 and 9 after a colon.
+    :return: The image format, with the options to save it.
+
+    >>> get_format("png:1").options
+    {'optimize': False, 'compress_level': 1}
+    >>> get_format("ppm").extension
+    'ppm'
+    >>> get_format("gif")
+    Traceback (most recent call last):
+    ...
+    ValueError: Unknown image format: gif
+    """
+    name, _, level = spec.lower().partition(":")
+    if name not in formats:
+        raise ValueError(f"Unknown image format: {name}")
+    image_format = formats[name]
+    if not level:
+        return image_format
+    if name != "png" or not level.isdigit() or int(level) > 9:
+        raise ValueError(f"Invalid compression level for {name}: {level}")
+    options = dict(image_format.options, compress_level=int(level))
+    return image_format._replace(options=options)
+
+
+def save_image(image, image_file: Union[str, BinaryIO],
+               image_format: ImageFormat = formats[default_format]) -> None:
+    """Store an image in a file with the given format.
+
+    :param image: The PIL Image to store.
+    :param image_file: The file name, or a file opened in binary mode.
+    :param image_format: The format of the file.
+    """
+    image.save(image_file, image_format.pil_format, **image_format.options)
+
+
+def write_image_data(data: bytearray, image_file: Union[str, BinaryIO],
+                     image_format: ImageFormat = formats[default_format],
+                     rng: Optional[random.Random] = None) -> None:
+    """Store encoded data as an RGB image in a file with the given format.
+
+    PNG files are written one scanline at a time without PIL, see
+    image_conversions.bytes_to_rows. Other formats build a PIL Image first,
+    measured as the to_image stage, and PIL encodes and writes it in the
+    write stage. Files that cannot seek, such as pipes, receive those
+    formats once they are complete, as some of them are written out of
+    order.
+
+    :param data: The encoded data.
+    :param image_file: The file name, or a file opened in binary mode.
+    :param image_format: The format of the file.
+    :param rng: The random generator for the padding, see
+    image_conversions.bytes_to_image.
+    """
+    if image_format.name != "png":
+        image = metrics.timed(
+            "to_image", image_conversions.bytes_to_image, data, rng)
+        if isinstance(image_file, str) or image_file.seekable():
+            metrics.timed("write", save_image, image, image_file,
+                          image_format)
+        else:
+            output = io.BytesIO()
+            metrics.timed("write", save_image, image, output, image_format)
+            metrics.timed("write", image_file.write, output.getbuffer())
+        return
+
+    _write_png(image_conversions.bytes_to_rows(data, rng), image_file,
+               image_format)
+
+
+def write_image_pieces(pieces: Iterable[bytes], data_length: int,
+                       image_file: Union[str, BinaryIO],
+                       image_format: ImageFormat = formats[default_format],
+                       rng: Optional[random.Random] = None) -> None:
+    """Store encoded data arriving in pieces as an RGB image.
+
+    PNG files are written as the pieces arrive, so only the current piece
+    and scanline are held in memory, see image_conversions.pieces_to_rows.
+    The length of the data must then be known in advance. Other formats
+    join the pieces first, see write_image_data.
+
+    :param pieces: The encoded data, in consecutive pieces.
+    :param data_length: The total amount of bytes of the pieces.
+    :param image_file: The file name, or a file opened in binary mode.
+    :param image_format: The format of the file.
+    :param rng: The random generator for the padding.
+
+    >>> import io
+    >>> f = io.BytesIO()
+    >>> write_image_pieces([b"Hel", b"lo"], 5, f)
+    >>> _ = f.seek(0)
+    >>> b"".join(iter_image_data(f))
+    b'Hello'
+    """
+    if image_format.name != "png":
+        data = bytearray().join(pieces)
+        if len(data) != data_length:
+            raise ValueError("Data does not match the length of the image")
+        write_image_data(data, image_file, image_format, rng)
+        return
+
+    _write_png(image_conversions.pieces_to_rows(pieces, data_length, rng),
+               image_file, image_format)
+
+
+def _write_png(image: tuple, image_file: Union[str, BinaryIO],
+               image_format: ImageFormat) -> None:
+    """Write the width, height and scanlines of an image as a PNG file."""
+    width, height, rows = image
+    compress_level = image_format.options.get("compress_level", 6)
+    if isinstance(image_file, str):
+        with open(image_file, "wb") as f:
+            png.write_png(f, width, height, rows, compress_level)
+    else:
+        png.write_png(image_file, width, height, rows, compress_level)
+
+
+def read_image_data(image_file: Union[str, BinaryIO]) -> bytearray:
+    """Recover the encoded data stored in an image file of any format.
+
+    PNG files written by this project are read one scanline at a time
+    without PIL. Other formats, and PNG files the built-in codec does not
+    support, such as those edited by other programs, are read through PIL.
+    Files that cannot seek, such as pipes, are read as they arrive when
+    they hold a PNG image, and read whole before PIL opens them otherwise.
+
+    :param image_file: The file name, or a file opened in binary mode.
+    :return: The encoded data.
+
+    >>> import io
+    >>> f = io.BytesIO()
+    >>> write_image_data(bytearray(b"Hello"), f)
+    >>> _ = f.seek(0)
+    >>> read_image_data(f)
+    bytearray(b'Hello')
+    """
+    if isinstance(image_file, str):
+        with open(image_file, "rb") as f:
+            return read_image_data(f)
+
+    rows = _open_png(image_file)
+    if rows is not None:
+        return image_conversions.rows_to_bytes(rows)
+    if not image_file.seekable():
+        image_file = io.BytesIO(metrics.timed("read", image_file.read, -1))
+
+    image = metrics.timed("read", _load_image, image_file)
+    return metrics.timed("from_image", image_conversions.image_to_bytes,
+                         image)
+
+
+def _load_image(image_file: BinaryIO):
+    """Open an image file with PIL and load its pixels.
+
+    PIL is only imported once an image other than PNG has to be read, so
+    the module loads quickly.
+
+    :param image_file: The file, opened in binary mode.
+    :return: The PIL Image.
+    """
+    from PIL import Image
+
+    image = Image.open(image_file, "r")
+    image.load()
+    return image
+
+
+def iter_image_data(image_file: Union[str, BinaryIO],
+                    chunk_size: int = 2 ** 20) -> Iterator[bytes]:
+    """Recover the encoded data stored in an image file, piece by piece.
+
+    PNG files supported by the built-in codec are read one scanline at a
+    time, so only a piece of the data is held in memory at once, see
+    image_conversions.rows_to_pieces. Other images are read whole, see
+    read_image_data, and returned in pieces.
+
+    :param image_file: The file name, or a file opened in binary mode.
+    :param chunk_size: The minimum amount of bytes of each piece, except
+    the last one.
+    :return: A generator of consecutive pieces of the encoded data.
+    """
+    if isinstance(image_file, str):
+        with open(image_file, "rb") as f:
+            yield from iter_image_data(f, chunk_size)
+        return
+
+    rows = _open_png(image_file)
+    if rows is None:
+        data = memoryview(read_image_data(image_file))
+        for i in range(0, len(data), chunk_size):
+            yield data[i:i + chunk_size]
+        return
+
+    pending = bytearray()
+    for piece in image_conversions.rows_to_pieces(rows):
+        pending += piece
+        if len(pending) >= chunk_size:
+            yield pending
+            pending = bytearray()
+    if pending:
+        yield pending
+
+
+def _open_png(image_file: BinaryIO) -> Optional[Iterator[bytes]]:
+    """Start reading a PNG file with the built-in codec, if it supports it.
+
+    :param image_file: The file, opened in binary mode.
+    :return: A generator of scanlines, or None if the file is not a PNG
+    image supported by the codec. The file is then left where it was, or
+    buffered into memory if it cannot seek.
+    """
+    if not image_file.seekable():
+        # Buffered streams show their next bytes without consuming them
+        if hasattr(image_file, "peek") and png.is_png(
+                image_file.peek(len(png.signature))):
+            return png.read_png(image_file)[2]
+        return None
+
+    start = image_file.tell()
+    if png.is_png(image_file.read(len(png.signature))):
+        image_file.seek(start)
+        try:
+            return png.read_png(image_file)[2]
+        except ValueError:
+            pass
+    image_file.seek(start)
+    return None
+
+
+def is_image_file(file_name: str) -> bool:
+    """Check whether a file name has the extension of an image format.
+
+    :param file_name: The file name.
+    :return: True if the extension matches any of the image formats.
+
+    >>> is_image_file("texts/a.PNG"), is_image_file("texts/a.txt")
+    (True, False)
+    """
+    return file_name.lower().endswith(
+        tuple(f".{extension}" for extension in image_extensions))
+
+
+if __name__ == "__main__":
+    import doctest
+
+    doctest.testmod()
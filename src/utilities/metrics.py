@@ -0,0 +1,188 @@
+from collections import defaultdict
+from threading import Lock
+from time import perf_counter
+from typing import Any, Callable, List, NamedTuple, Optional
+import json
+import logging
+import os
+
+
+class StageEvent(NamedTuple):
+    """Measurement of a single stage of the encoding or decoding pipeline.
+
+    The algorithm identifier is only set for the stages that run password
+    layers, and contains every algorithm combined in the layer.
+    """
+    stage: str
+    seconds: float
+    bytes_in: int
+    bytes_out: int
+    algorithm_id: Optional[str] = None
+
+
+Observer = Callable[[StageEvent], None]
+
+# Stages are only measured while there is at least one observer
+observers: List[Observer] = []
+
+
+def add_observer(observer: Observer) -> None:
+    """Register a function to receive an event for every measured stage.
+
+    :param observer: The function receiving each StageEvent.
+    """
+    observers.append(observer)
+
+
+def remove_observer(observer: Observer) -> None:
+    """Stop sending events to a registered function.
+
+    :param observer: The function to unregister.
+    """
+    observers.remove(observer)
+
+
+def _size(value: Any) -> int:
+    """Determine the amount of bytes of a stage input or output.
+
+    Integers are taken as byte counts, images count the bytes of their
+    pixels, and file names or other objects without a length count as zero.
+    """
+    if isinstance(value, int):
+        return value
+    if isinstance(value, str):
+        return 0
+    if hasattr(value, "size") and hasattr(value, "getbands"):
+        return value.size[0] * value.size[1] * len(value.getbands())
+    try:
+        return len(value)
+    except TypeError:
+        return 0
+
+
+def timed(stage: str, function: Callable, data: Any, *args,
+          algorithm_id: Optional[str] = None, **kwargs) -> Any:
+    """Call a function, measuring it as a stage if there are observers.
+
+    Without observers, the function is called directly, so measuring adds no
+    noticeable overhead when disabled.
+
+    :param stage: The name of the stage.
+    :param function: The function running the stage.
+    :param data: The first argument of the function, measured as the input.
+    :param args: The rest of positional arguments of the function.
+    :param algorithm_id: The algorithm identifier of password layers.
+    :param kwargs: The keyword arguments of the function.
+    :return: The value returned by the function.
+
+    >>> events = []
+    >>> add_observer(events.append)
+    >>> timed("reverse", bytes.upper, bytes("abc", "ascii"))
+    b'ABC'
+    >>> remove_observer(events.append)
+    >>> events[0].stage, events[0].bytes_in, events[0].bytes_out
+    ('reverse', 3, 3)
+    """
+    if not observers:
+        return function(data, *args, **kwargs)
+    start = perf_counter()
+    result = function(data, *args, **kwargs)
+    event = StageEvent(stage, perf_counter() - start, _size(data),
+                       _size(result), algorithm_id)
+    for observer in list(observers):
+        observer(event)
+    return result
+
+
+class LogExporter:
+    """Observer that writes every event as a JSON line to a logger.
+
+    This class requires the following parameters:
+        Logger, defaults to the "src.metrics" logger
+        Level, defaults to INFO
+    """
+
+    def __init__(self, logger: Optional[logging.Logger] = None,
+                 level: int = logging.INFO):
+        self.logger = logger or logging.getLogger("src.metrics")
+        self.level = level
+
+    def __call__(self, event: StageEvent) -> None:
+        self.logger.log(self.level, json.dumps(event._asdict()))
+
+
+class PrometheusExporter:
+    """Observer that aggregates events into Prometheus counters.
+
+    Calls, seconds and bytes are added up for every stage and algorithm, and
+    rendered in the Prometheus text exposition format.
+
+    This class requires no parameters.
+
+    >>> exporter = PrometheusExporter()
+    >>> exporter(StageEvent("layer", 0.5, 10, 10, "h"))
+    >>> print(exporter.render().splitlines()[2])
+    t2i_stage_calls_total{stage="layer",algorithm="h"} 1
+    """
+
+    metrics = [
+        ("calls", "Amount of times each stage was run."),
+        ("seconds", "Time spent in each stage."),
+        ("bytes_in", "Bytes received by each stage."),
+        ("bytes_out", "Bytes produced by each stage."),
+    ]
+
+    def __init__(self):
+        self._lock = Lock()
+        self._totals = defaultdict(lambda: [0, 0.0, 0, 0])
+
+    def __call__(self, event: StageEvent) -> None:
+        with self._lock:
+            totals = self._totals[(event.stage, event.algorithm_id or "")]
+            totals[0] += 1
+            totals[1] += event.seconds
+            totals[2] += event.bytes_in
+            totals[3] += event.bytes_out
+
+    def render(self) -> str:
+        """Render the aggregated counters in the text exposition format.
+
+        :return: The counters, one per line, with HELP and TYPE comments.
+        """
+        lines = []
+        with self._lock:
+            totals = sorted(self._totals.items())
+        for position, (metric, description) in enumerate(self.metrics):
+            name = f"t2i_stage_{metric}_total"
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} counter")
+            for (stage, algorithm_id), values in totals:
+                lines.append(f'{name}{{stage="{stage}",'
+                             f'algorithm="{algorithm_id}"}} {values[position]}')
+        return "\n".join(lines) + "\n"
+
+
+def enable_from_environment() -> Optional[PrometheusExporter]:
+    """Register the exporters listed in the T2I_METRICS environment variable.
+
+    The variable holds a comma-separated list of exporters: "log" writes the
+    events to the standard error output, and "prometheus" aggregates them.
+
+    :return: The Prometheus exporter, if enabled, so it can be rendered once
+    the work is done.
+    """
+    names = os.environ.get("T2I_METRICS", "").split(",")
+    if "log" in names:
+        logging.basicConfig(level=logging.INFO, format="%(message)s")
+        add_observer(LogExporter())
+    if "prometheus" in names:
+        exporter = PrometheusExporter()
+        add_observer(exporter)
+        return exporter
+    return None
+
+
+if __name__ == "__main__":
+    import doctest
+
+    doctest.testmod()
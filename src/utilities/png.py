@@ -0,0 +1,227 @@
+from typing import BinaryIO, Iterable, Iterator, Tuple
+from src.utilities import metrics
+import struct
+import zlib
+
+signature = bytes([137]) + bytes("PNG\r\n", "ascii") + bytes([26, 10])
+# 8 bits per sample, RGB, default compression and filter methods, no
+# interlacing
+_IHDR_FIELDS = (8, 2, 0, 0, 0)
+_LOW_BITS = 127
+_HIGH_BIT = 128
+
+
+def _chunk(chunk_type: bytes, data: bytes) -> bytes:
+    """Frame the data of a chunk with its length, type and checksum."""
+    return b"".join((struct.pack(">I", len(data)), chunk_type, data,
+                     struct.pack(">I", zlib.crc32(data, zlib.crc32(
+                         chunk_type)))))
+
+
+def write_png(f: BinaryIO, width: int, height: int, rows: Iterable[bytes],
+              compress_level: int = 6, chunk_size: int = 2 ** 16) -> int:
+    """Write an RGB image with 8 bits per sample as a PNG file.
+
+    Scanlines are compressed as they arrive from the iterable, and the
+    compressed data is written in chunks of a fixed size, so only one
+    scanline and one chunk are held in memory at once. Scanlines are stored
+    without filtering, as the encoded data is random and filters do not make
+    it more compressible. Compression and writing are measured as the
+    deflate and write stages, see metrics.timed.
+
+    :param f: The file to write to, opened in binary mode.
+    :param width: The width of the image, in pixels.
+    :param height: The height of the image, in pixels.
+    :param rows: The scanlines, from top to bottom, holding the RGB values of
+    width pixels each.
+    :param compress_level: The zlib compression level, from 0 to 9.
+    :param chunk_size: The maximum length of each IDAT chunk.
+    :return: The amount of bytes written.
+
+    >>> import io
+    >>> f = io.BytesIO()
+    >>> size = write_png(f, 2, 1, [bytes(range(6))])
+    >>> _ = f.seek(0)
+    >>> width, height, rows = read_png(f)
+    >>> width, height, list(rows)
+    (2, 1, [b'\\x00\\x01\\x02\\x03\\x04\\x05'])
+    """
+    written = f.write(signature)
+    written += f.write(_chunk(b"IHDR", struct.pack(
+        ">IIBBBBB", width, height, *_IHDR_FIELDS)))
+
+    compressor = zlib.compressobj(compress_level)
+    pending = bytearray()
+    row_size = width * 3
+    row_count = 0
+    for row in rows:
+        if len(row) != row_size:
+            raise ValueError("Scanline does not match the image width")
+        # Filter type 0, the scanline is stored as it is
+        pending += compressor.compress(b"\x00")
+        pending += metrics.timed("deflate", compressor.compress, row)
+        row_count += 1
+        while len(pending) >= chunk_size:
+            written += metrics.timed("write", f.write, _chunk(
+                b"IDAT", bytes(pending[:chunk_size])))
+            del pending[:chunk_size]
+    if row_count != height:
+        raise ValueError("Amount of scanlines does not match the image height")
+
+    pending += metrics.timed("deflate", compressor.flush, zlib.Z_FINISH)
+    for i in range(0, len(pending), chunk_size):
+        written += metrics.timed("write", f.write, _chunk(
+            b"IDAT", bytes(pending[i:i + chunk_size])))
+    written += f.write(_chunk(b"IEND", bytes()))
+    return written
+
+
+def _read_chunk(f: BinaryIO) -> Tuple[bytes, bytes]:
+    """Read the next chunk of a PNG file, verifying its checksum.
+
+    :param f: The file to read from, after the signature or a chunk.
+    :return: The type and the data of the chunk.
+    """
+    header = f.read(8)
+    if len(header) < 8:
+        raise ValueError("PNG file is truncated")
+    length, chunk_type = struct.unpack(">I4s", header)
+    data = metrics.timed("read", f.read, length)
+    checksum = f.read(4)
+    if len(data) < length or len(checksum) < 4:
+        raise ValueError("PNG file is truncated")
+    if struct.unpack(">I", checksum)[0] != zlib.crc32(
+            data, zlib.crc32(chunk_type)):
+        raise ValueError(f"Corrupt PNG chunk {chunk_type!r}")
+    return chunk_type, data
+
+
+def _add_bytes(row: bytes, other: bytes) -> bytes:
+    """Add two scanlines byte by byte, modulo 256, without a Python loop.
+
+    The lower 7 bits of every byte are added at once as a single integer,
+    and the highest bit of each byte is then set through XOR, so no carry
+    crosses into the next byte.
+    """
+    length = len(row)
+    low = int.from_bytes(bytes([_LOW_BITS]) * length, "big")
+    high = int.from_bytes(bytes([_HIGH_BIT]) * length, "big")
+    row_value = int.from_bytes(row, "big")
+    other_value = int.from_bytes(other, "big")
+    value = ((row_value & low) + (other_value & low)) ^ (
+        (row_value ^ other_value) & high)
+    return value.to_bytes(length, "big")
+
+
+def _paeth(left: int, up: int, up_left: int) -> int:
+    estimate = left + up - up_left
+    distance_left = abs(estimate - left)
+    distance_up = abs(estimate - up)
+    distance_up_left = abs(estimate - up_left)
+    if distance_left <= distance_up and distance_left <= distance_up_left:
+        return left
+    if distance_up <= distance_up_left:
+        return up
+    return up_left
+
+
+def unfilter(filter_type: int, row: bytes, previous: bytes) -> bytes:
+    """Reverse the filter applied to a scanline.
+
+    Filters 0 (none) and 2 (up) are reversed without a Python loop. The rest
+    are only found in files written by other encoders, such as PIL, and are
+    reversed one byte at a time.
+
+    :param filter_type: The filter type, from 0 to 4.
+    :param row: The filtered scanline, without its filter type.
+    :param previous: The previous scanline, already unfiltered, or zeros for
+    the first one.
+    :return: The original scanline.
+
+    >>> unfilter(1, bytes([1, 2, 3, 4, 5, 6]), bytes(6))
+    b'\\x01\\x02\\x03\\x05\\x07\\t'
+    >>> unfilter(2, bytes([255, 1]), bytes([1, 255]))
+    b'\\x00\\x00'
+    """
+    if filter_type == 0:
+        return row
+    if filter_type == 2:
+        return _add_bytes(row, previous)
+    if filter_type not in (1, 3, 4):
+        raise ValueError(f"Unknown PNG filter type {filter_type}")
+
+    result = bytearray(row)
+    for i in range(len(result)):
+        left = result[i - 3] if i >= 3 else 0
+        if filter_type == 1:
+            result[i] = (result[i] + left) & 255
+        elif filter_type == 3:
+            result[i] = (result[i] + ((left + previous[i]) >> 1)) & 255
+        else:
+            up_left = previous[i - 3] if i >= 3 else 0
+            result[i] = (result[i] + _paeth(left, previous[i], up_left)) & 255
+    return bytes(result)
+
+
+def read_png(f: BinaryIO) -> Tuple[int, int, Iterator[bytes]]:
+    """Read an RGB image with 8 bits per sample from a PNG file.
+
+    The header is read right away, and the scanlines are decompressed and
+    unfiltered as they are requested, one IDAT chunk at a time. Reading and
+    decompression are measured as the read and inflate stages, see
+    metrics.timed.
+
+    :param f: The file to read from, opened in binary mode.
+    :return: The width and height of the image, in pixels, and a generator
+    of its scanlines from top to bottom.
+    """
+    if f.read(len(signature)) != signature:
+        raise ValueError("File is not a PNG image")
+    chunk_type, data = _read_chunk(f)
+    if chunk_type != b"IHDR" or len(data) != 13:
+        raise ValueError("PNG file does not start with its header")
+    width, height, *fields = struct.unpack(">IIBBBBB", data)
+    if tuple(fields) != _IHDR_FIELDS:
+        raise ValueError("Only non-interlaced RGB images with 8 bits per "
+                         "sample are supported")
+    return width, height, _read_rows(f, width, height)
+
+
+def _read_rows(f: BinaryIO, width: int, height: int) -> Iterator[bytes]:
+    """Decompress and unfilter the scanlines of a PNG file, see read_png."""
+    decompressor = zlib.decompressobj()
+    row_size = width * 3
+    previous = bytes(row_size)
+    pending = bytearray()
+    row_count = 0
+    while row_count < height:
+        chunk_type, data = _read_chunk(f)
+        if chunk_type == b"IEND":
+            raise ValueError("PNG file has less scanlines than its height")
+        if chunk_type != b"IDAT":
+            continue
+        pending += metrics.timed("inflate", decompressor.decompress, data)
+        while len(pending) > row_size and row_count < height:
+            previous = unfilter(pending[0], bytes(pending[1:row_size + 1]),
+                                previous)
+            del pending[:row_size + 1]
+            row_count += 1
+            yield previous
+
+
+def is_png(data: bytes) -> bool:
+    """Check whether the data starts with the PNG signature.
+
+    :param data: The start of a file.
+    :return: True if the file is a PNG image.
+
+    >>> is_png(signature + bytes(8)), is_png(bytes("BM", "ascii"))
+    (True, False)
+    """
+    return data[:len(signature)] == signature
+
+
+if __name__ == "__main__":
+    import doctest
+
+    doctest.testmod()
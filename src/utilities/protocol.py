@@ -0,0 +1,81 @@
+from typing import BinaryIO, Tuple
+import asyncio
+import json
+import os
+import struct
+import tempfile
+
+# Every message is made of the lengths of its header and payload, a JSON
+# header and a binary payload.
+_LENGTHS = struct.Struct(">II")
+
+default_socket_path = os.environ.get(
+    "T2I_SOCKET", os.path.join(tempfile.gettempdir(), "t2i.sock"))
+
+
+def pack_message(header: dict, payload: bytes = bytes()) -> bytes:
+    """Build a message for the daemon protocol.
+
+    :param header: The message header, serializable as JSON.
+    :param payload: The binary contents of the message.
+    :return: The message, ready to be sent.
+
+    >>> import io
+    >>> read_message(io.BytesIO(pack_message({"id": 1}, bytes([1, 2]))))
+    ({'id': 1}, b'\\x01\\x02')
+    """
+    header_bytes = bytes(json.dumps(header), "ascii")
+    return b"".join((_LENGTHS.pack(len(header_bytes), len(payload)),
+                     header_bytes, payload))
+
+
+def read_message(stream: BinaryIO) -> Tuple[dict, bytes]:
+    """Read a single message from a blocking binary stream.
+
+    :param stream: The stream to read from.
+    :return: A tuple containing the header and the payload of the message.
+
+    >>> import io
+    >>> read_message(io.BytesIO(pack_message({"id": 1}, bytes(3))[:-1]))
+    Traceback (most recent call last):
+    ...
+    EOFError: Connection closed in the middle of a message
+    """
+    lengths = _read_exactly(stream, _LENGTHS.size)
+    header_length, payload_length = _LENGTHS.unpack(lengths)
+    header = json.loads(_read_exactly(stream, header_length))
+    return header, _read_exactly(stream, payload_length)
+
+
+def _read_exactly(stream: BinaryIO, length: int) -> bytes:
+    data = stream.read(length)
+    if len(data) != length:
+        raise EOFError("Connection closed in the middle of a message")
+    return data
+
+
+async def read_message_async(
+        reader: asyncio.StreamReader) -> Tuple[dict, bytes]:
+    """Read a single message from an asyncio stream.
+
+    :param reader: The stream to read from.
+    :return: A tuple containing the header and the payload of the message.
+
+    >>> async def receive(message):
+    ...     reader = asyncio.StreamReader()
+    ...     reader.feed_data(message)
+    ...     reader.feed_eof()
+    ...     return await read_message_async(reader)
+    >>> asyncio.run(receive(pack_message({"op": "stats"}) * 2))
+    ({'op': 'stats'}, b'')
+    """
+    lengths = await reader.readexactly(_LENGTHS.size)
+    header_length, payload_length = _LENGTHS.unpack(lengths)
+    header = json.loads(await reader.readexactly(header_length))
+    return header, await reader.readexactly(payload_length)
+
+
+if __name__ == "__main__":
+    import doctest
+
+    doctest.testmod()
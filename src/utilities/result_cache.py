@@ -0,0 +1,246 @@
+from collections import OrderedDict
+from threading import Lock
+from typing import Optional
+import hashlib
+import os
+from src.algorithms.plan import Plan
+from src.utilities.file_io import atomic_write
+
+default_memory_size = 64 * 2 ** 20
+default_disk_size = 2 ** 30
+_lock_file = ".lock"
+# Stores between scans of the directory, which also counts the files stored
+# by other processes
+_scan_interval = 256
+# Part of the disk size freed when the directory is full, so the next stores
+# do not scan it again right away
+_headroom = 8
+
+
+class ResultCache:
+    """Store of encoded images and decoded texts, addressed by their inputs.
+
+    Results are stored under a hash of the input data, the operation, and
+    the password compiled into its plan, see key. The most recently used
+    results are kept in memory, and optionally in a directory shared by
+    several processes. Both stores are bounded in size, dropping the least
+    recently used results first.
+
+    Files are written through file_io.atomic_write, so other processes
+    never read a partial result, and only one process removes files at a
+    time, holding a lock on the directory. Each process keeps a running
+    total of the bytes in the directory, and only scans it when the total
+    exceeds the disk size, or every _scan_interval stores to count the files
+    of other processes. Decoded texts are stored as they are, so the
+    directory is only accessible by its owner.
+
+    Encoding draws the MSB values, the padding and the salt from a random
+    generator, so encoded images can only be stored when the generator is
+    seeded by the caller, as in engine.encode_image.
+
+    This class requires the following parameters:
+        Directory, where results are stored on disk, or None to only keep
+        them in memory
+        Memory size, the maximum amount of bytes kept in memory
+        Disk size, the maximum amount of bytes kept in the directory
+
+    >>> from src.cipher import get_cipher
+    >>> cache = ResultCache()
+    >>> key = cache.key("decode", b"image", get_cipher(b"hfb3"))
+    >>> cache.get(key) is None
+    True
+    >>> cache.put(key, b"Hello")
+    >>> cache.get(key)
+    b'Hello'
+    """
+
+    def __init__(self, directory: Optional[str] = None,
+                 memory_size: int = default_memory_size,
+                 disk_size: int = default_disk_size):
+        self.directory = directory
+        self.memory_size = memory_size
+        self.disk_size = disk_size
+        self._results = OrderedDict()
+        self._stored = 0
+        # Bytes in the directory as of the last scan plus the files stored
+        # since then, unknown until the first scan
+        self._disk_stored = None
+        self._puts = 0
+        self._lock = Lock()
+        if directory is not None:
+            os.makedirs(directory, mode=0o700, exist_ok=True)
+
+    def __getstate__(self) -> dict:
+        # Worker processes share the directory, not the results in memory
+        return {"directory": self.directory, "memory_size": self.memory_size,
+                "disk_size": self.disk_size}
+
+    def __setstate__(self, state: dict) -> None:
+        self.__init__(**state)
+
+    @staticmethod
+    def key(operation: str, data: bytes, plan: Plan, *options) -> str:
+        """Compute the address of a result.
+
+        :param operation: The name of the operation, such as "decode".
+        :param data: The input of the operation, an image file or a text.
+        :param plan: The compiled password.
+        :param options: Further options changing the result, such as the
+        image format or the random seed.
+        :return: The address, as a hexadecimal string.
+
+        >>> from src.cipher import get_cipher
+        >>> a = ResultCache.key("decode", b"image", get_cipher(b"hfb3"))
+        >>> b = ResultCache.key("decode", b"image", get_cipher(b"hfb3", 8))
+        >>> len(a), a == b
+        (64, False)
+        """
+        parts = [operation, plan.algorithm_list, plan.bits, plan.steps,
+                 *options, hashlib.sha256(data).hexdigest()]
+        digest = hashlib.sha256()
+        for part in parts:
+            part = repr(part).encode("utf-8")
+            digest.update(len(part).to_bytes(4, "big") + part)
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Obtain a stored result, from memory or else from the directory.
+
+        :param key: The address of the result, see key.
+        :return: The result, or None if it is not stored.
+        """
+        with self._lock:
+            result = self._results.get(key)
+            if result is not None:
+                self._results.move_to_end(key)
+                return result
+        if self.directory is None:
+            return None
+
+        file_name = self._file_name(key)
+        try:
+            with open(file_name, "rb") as f:
+                result = f.read()
+            # The modification time orders the files by their last use
+            os.utime(file_name)
+        except FileNotFoundError:
+            # Never stored, or removed by another process
+            return None
+        self._remember(key, result)
+        return result
+
+    def put(self, key: str, result: bytes) -> None:
+        """Store a result, dropping the least recently used ones to fit.
+
+        :param key: The address of the result, see key.
+        :param result: The result.
+        """
+        result = bytes(result)
+        self._remember(key, result)
+        if self.directory is None or len(result) > self.disk_size:
+            return
+
+        file_name = self._file_name(key)
+        # Results are deterministic, a stored file already holds the result
+        added = 0 if os.path.exists(file_name) else len(result)
+        os.makedirs(os.path.dirname(file_name), mode=0o700, exist_ok=True)
+        with atomic_write(file_name, "wb") as f:
+            f.write(result)
+        with self._lock:
+            self._puts += 1
+            if self._disk_stored is not None:
+                self._disk_stored += added
+            scan = (self._disk_stored is None
+                    or self._disk_stored > self.disk_size
+                    or self._puts % _scan_interval == 0)
+        if scan:
+            self._evict()
+
+    def clear(self) -> None:
+        """Drop every stored result, in memory and in the directory."""
+        with self._lock:
+            self._results.clear()
+            self._stored = 0
+        if self.directory is not None:
+            self._evict(0)
+
+    def _file_name(self, key: str) -> str:
+        # Spread the files over subdirectories to keep them small
+        return os.path.join(self.directory, key[:2], key)
+
+    def _remember(self, key: str, result: bytes) -> None:
+        """Keep a result in memory, dropping the least recently used ones."""
+        if len(result) > self.memory_size:
+            return
+        with self._lock:
+            previous = self._results.pop(key, None)
+            if previous is not None:
+                self._stored -= len(previous)
+            while self._results \
+                    and self._stored + len(result) > self.memory_size:
+                _, dropped = self._results.popitem(last=False)
+                self._stored -= len(dropped)
+            self._results[key] = result
+            self._stored += len(result)
+
+    def _evict(self, disk_size: Optional[int] = None) -> None:
+        """Remove the least recently used files until the directory fits.
+
+        The whole directory is scanned, so the running total of its size is
+        updated with the files of other processes too. When it exceeds the
+        disk size, files are removed until it fits with some room to spare.
+
+        :param disk_size: The size to fit in, disk_size by default.
+        """
+        # Only available on Unix, imported when a directory is used
+        import fcntl
+
+        if disk_size is None:
+            disk_size = self.disk_size
+            target = disk_size - disk_size // _headroom
+        else:
+            target = disk_size
+        with open(os.path.join(self.directory, _lock_file), "wb") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            files = []
+            for entry in os.scandir(self.directory):
+                if not entry.is_dir():
+                    continue
+                for file_entry in os.scandir(entry.path):
+                    try:
+                        stat = file_entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    # Temporary files of atomic_write are never removed here
+                    if not file_entry.name.startswith("."):
+                        files.append((stat.st_mtime, stat.st_size,
+                                      file_entry.path))
+
+            stored = sum(size for _, size, _ in files)
+            # Periodic scans only update the total while the directory fits
+            files = sorted(files) if stored > disk_size else []
+            for _, size, file_name in files:
+                if stored <= target:
+                    break
+                try:
+                    os.unlink(file_name)
+                except FileNotFoundError:
+                    pass
+                stored -= size
+        with self._lock:
+            self._disk_stored = stored
+
+
+def from_environment() -> Optional[ResultCache]:
+    """Create a cache in the directory of the T2I_CACHE environment variable.
+
+    :return: The cache, or None if the variable is not set.
+    """
+    directory = os.environ.get("T2I_CACHE")
+    return ResultCache(directory) if directory else None
+
+
+if __name__ == "__main__":
+    import doctest
+
+    doctest.testmod()